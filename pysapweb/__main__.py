@@ -0,0 +1,425 @@
+"""
+    __main__
+    ~~~~~~~~
+
+    The command-line interface, for running bulk jobs without writing a
+    script::
+
+        python -m pysapweb --jobs 4 create -i rfps.jsonl -o created.jsonl
+        python -m pysapweb view 123 124 125
+        python -m pysapweb search --cost-object 6666666 --format csv
+        python -m pysapweb inbox
+
+    Input and output are JSON Lines or CSV, chosen with `--format` or from
+    the file extension. `create` takes one RFP per JSON line, with the
+    arguments of :func:`rfp.create` as keys (`payee` as [is_mit, name],
+    `address`, `line_items` and `send_to` as lists); in CSV, each row is one
+    line item, with the columns name, is_mit, payee, address, city, state,
+    postal_code, country, date_of_service, gl_account, cost_object, amount,
+    explanation, office_note, receipts (separated by ';'), send_to,
+    send_to_note and, optionally, rfp_id. Consecutive rows with the same
+    rfp_id form one RFP, and must not disagree on its other columns. Without
+    an rfp_id, consecutive rows with the same name form one RFP if they
+    agree on the other columns, and a row with no name is an RFP of its own.
+    The RFP's columns may be left empty after its first row. Receipts with
+    the same contents as another of the same RFP are attached once and
+    listed under skipped_receipts in the output. `view` takes RFP
+    numbers as arguments, or from the rfp_number key or column of the input.
+
+    `create` and `view` run on `--jobs` browsers at once. Progress, rate,
+    latency percentiles and failures are reported on stderr. Browsers are
+    watched by :mod:`watchdog`, and killed and replaced when they hang.
+"""
+
+import argparse
+import csv
+import json
+import Queue
+import sys
+import threading
+import time
+
+from pysapweb import rfp, sap_profiles, watchdog
+from pysapweb.pool import BrowserPool
+
+#: Columns of CSV input that describe a whole RFP rather than a line item.
+RFP_COLUMNS = ("name", "is_mit", "payee", "address", "city", "state",
+               "postal_code", "country", "office_note", "send_to",
+               "send_to_note")
+
+#: Columns of CSV output, by command.
+OUTPUT_COLUMNS = {
+    "create": ("index", "name", "rfp_number", "skipped_receipts", "error"),
+    "view": ("index", "rfp_number", "inbox", "payee", "company_code",
+             "rfp_name", "rfp_type", "payment_method", "mailing_instructions",
+             "addressee", "phone", "address", "city", "state", "postal_code",
+             "country", "tax_type", "ssn_tin", "line_items", "office_note",
+             "history", "error"),
+    "search": ("rfp_number", "creation_date", "payee", "created_by",
+               "rfp_name", "location_status", "cost_object", "amount"),
+    "inbox": ("rfp_number", "state", "receipt", "creation_date", "payee",
+              "created_by", "cost_object", "amount"),
+}
+
+def main(argv=None):
+    """
+    Run the command line given by `argv` (by default, sys.argv). Return the
+    exit status: 0 if every item succeeded, 1 otherwise.
+    """
+    args = _parser().parse_args(argv)
+    fmt = args.format or _format_of(args.output) or _format_of(args.input) \
+          or "jsonl"
+    if args.remote:
+        start = sap_profiles.RemoteEndpoints(args.remote, args.profile,
+                                             args.lean)
+    else:
+        start = lambda: sap_profiles.load_firefox(args.profile, args.lean)
+    factory = watchdog.supervise(
+        start, timeout=args.timeout, max_operations=args.recycle_after,
+        max_rss=args.max_rss << 20 if args.max_rss else None)
+    stats = Stats(sys.stderr, quiet=args.quiet)
+    with _open(args.output, "w") as output:
+        writer = Writer(output, fmt, OUTPUT_COLUMNS[args.command])
+        if args.command in ("search", "inbox"):
+            browser = factory()
+            try:
+                rows = _search(browser, args) if args.command == "search" \
+                       else rfp.InboxPage(browser).table()
+            finally:
+                browser.quit()
+            for row in rows:
+                writer.write(row)
+            return 0
+        func = _create if args.command == "create" else _view
+        pool = BrowserPool(factory, args.jobs, watchdog.retire)
+        if args.command == "view" and args.rfp_numbers:
+            run(pool, func, args.rfp_numbers, writer, stats, args.jobs)
+        else:
+            with _open(args.input, "r") as source:
+                records = _read(source, _format_of(args.input) or fmt)
+                items = _create_items(records) if args.command == "create" \
+                        else _view_items(records)
+                try:
+                    run(pool, func, items, writer, stats, args.jobs)
+                except ValueError as e:
+                    # malformed input; items already started have finished
+                    stats.report(final=True)
+                    sys.stderr.write("error: %s\n" % e)
+                    return 2
+    stats.report(final=True)
+    return 1 if stats.failures else 0
+
+def _parser():
+    parser = argparse.ArgumentParser(prog="python -m pysapweb",
+                                     description="Run bulk SAPweb jobs.")
+    parser.add_argument("--profile", default=sap_profiles.DEFAULT_PROFILE,
+                        help="Firefox profile directory")
+    parser.add_argument("--lean", action="store_true",
+                        help="run Firefox headless with a lean profile "
+                             "(the profile must have no master password)")
+    parser.add_argument("--remote", action="append", metavar="URL",
+                        help="WebDriver server to start sessions on; may be "
+                             "given more than once")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of browsers to run at once")
+    parser.add_argument("--timeout", type=float, default=300,
+                        help="seconds before a hung browser is killed")
+    parser.add_argument("--max-rss", type=int, metavar="MB",
+                        help="replace browsers using more memory than this")
+    parser.add_argument("--recycle-after", type=int, metavar="N",
+                        help="replace browsers after N WebDriver commands")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="don't report progress on stderr")
+    io = argparse.ArgumentParser(add_help=False)
+    io.add_argument("--format", choices=("jsonl", "csv"),
+                    help="input and output format")
+    io.add_argument("-i", "--input", default="-",
+                    help="input file, or - for stdin")
+    io.add_argument("-o", "--output", default="-",
+                    help="output file, or - for stdout")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("create", parents=[io], help="create RFPs")
+    view = commands.add_parser("view", parents=[io], help="view RFPs")
+    view.add_argument("rfp_numbers", nargs="*", metavar="rfp_number")
+    search = commands.add_parser("search", parents=[io], help="search RFPs")
+    for field in ("rfp_number", "rfp_name", "payee", "cost_object",
+                  "gl_account", "company_code", "creation_start",
+                  "creation_end"):
+        search.add_argument("--" + field.replace("_", "-"))
+    for rfp_type in ("parked", "posted", "deleted"):
+        search.add_argument("--" + rfp_type, action="store_true",
+                            help="include %s RFPs" % rfp_type)
+    commands.add_parser("inbox", parents=[io], help="list the inbox")
+    return parser
+
+class Stats(object):
+    """
+    Counts finished items and their latencies, and reports them on `stream`
+    at most once every `interval` seconds.
+    """
+    def __init__(self, stream, interval=1.0, quiet=False):
+        self.stream = stream
+        self.interval = interval
+        self.quiet = quiet
+        self.start = time.time()
+        self.latencies = []
+        self.failures = 0
+        self._reported = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok):
+        """
+        Record an item that took `seconds` and succeeded if `ok`.
+        """
+        with self._lock:
+            self.latencies.append(seconds)
+            if not ok:
+                self.failures += 1
+            if time.time() - self._reported >= self.interval:
+                self.report()
+
+    def report(self, final=False):
+        """
+        Write a line of statistics.
+        """
+        self._reported = time.time()
+        if self.quiet:
+            return
+        latencies = sorted(self.latencies)
+        def at(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[int(fraction * (len(latencies) - 1))]
+        elapsed = max(time.time() - self.start, 1e-9)
+        self.stream.write("\r%d done, %d failed, %.2f/s, latency p50 %.1fs "
+                          "p90 %.1fs p99 %.1fs" %
+                          (len(latencies), self.failures,
+                           len(latencies) / elapsed, at(0.5), at(0.9),
+                           at(0.99)))
+        if final:
+            self.stream.write("\n")
+        self.stream.flush()
+
+class Writer(object):
+    """
+    Writes dictionaries to `stream` as JSON Lines or CSV. Safe to share
+    between threads. In CSV, only the given `columns` are written, and nested
+    values are written as JSON.
+    """
+    def __init__(self, stream, fmt, columns):
+        self.stream = stream
+        self.fmt = fmt
+        self.columns = columns
+        self._csv = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            if self.fmt == "jsonl":
+                self.stream.write(json.dumps(record, default=str) + "\n")
+            else:
+                if self._csv is None:
+                    self._csv = csv.DictWriter(self.stream, self.columns,
+                                               extrasaction="ignore")
+                    self._csv.writeheader()
+                self._csv.writerow(dict((key, _cell(val))
+                                        for key, val in record.items()))
+            self.stream.flush()
+
+def run(pool, func, items, writer, stats, jobs):
+    """
+    Call `func(browser, item)` for every (index, item) pair in `items`, on
+    `jobs` threads sharing `pool`, and write each returned record as it
+    finishes. Failures are written as records with an `error` key.
+    """
+    queue = Queue.Queue(maxsize=jobs * 2)
+    def work():
+        while True:
+            entry = queue.get()
+            if entry is None:
+                return
+            index, item = entry
+            start = time.time()
+            try:
+                with pool.browser() as browser:
+                    record = func(browser, item)
+                ok = True
+            except Exception as e:
+                record = {"error": "%s: %s" % (type(e).__name__, e)}
+                ok = False
+            record["index"] = index
+            writer.write(record)
+            stats.record(time.time() - start, ok)
+    workers = [threading.Thread(target=work) for i in range(jobs)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    try:
+        for entry in enumerate(items):
+            queue.put(entry)
+    finally:
+        for worker in workers:
+            queue.put(None)
+        for worker in workers:
+            worker.join()
+        pool.close()
+
+def _create(browser, kwargs):
+    skipped = []
+    return {"name": kwargs.get("name"),
+            "rfp_number": rfp.create(browser, skipped=skipped, **kwargs),
+            "skipped_receipts": [receipt for receipt, _ in skipped]}
+
+def _view(browser, rfp_number):
+    return rfp.view(browser, rfp_number)
+
+def _search(browser, args):
+    criteria = {}
+    for field in ("rfp_number", "rfp_name", "payee", "cost_object",
+                  "gl_account", "company_code", "creation_start",
+                  "creation_end"):
+        if getattr(args, field):
+            criteria[field] = getattr(args, field)
+    return rfp.search(browser, parked=args.parked, posted=args.posted,
+                      deleted=args.deleted, **criteria)
+
+def _create_items(records):
+    """
+    Convert input records into keyword arguments for :func:`rfp.create`.
+    CSV rows (which have a date_of_service column) are grouped into RFPs as
+    described in the module documentation. ValueError is raised for rows
+    with the same rfp_id that disagree.
+    """
+    current = first = None
+    for row, record in enumerate(records, 1):
+        if "date_of_service" not in record:
+            if current is not None:
+                yield current
+            current = first = None
+            yield _create_kwargs(record)
+            continue
+        item = [record.get(key, "") for key in ("date_of_service",
+                "gl_account", "cost_object", "amount", "explanation")]
+        if first is not None and _same_rfp(first, record, row):
+            current["line_items"].append(item)
+            current["receipts"].extend(_receipts(record))
+            continue
+        if current is not None:
+            yield current
+        first = record
+        address = [record.get(key) for key in ("address", "city", "state",
+                                               "postal_code", "country")]
+        if not address[2]:
+            del address[2]
+        current = {"name": record.get("name", ""),
+                   "payee": (_boolean(record.get("is_mit")),
+                             record.get("payee")),
+                   "address": tuple(address) if any(address) else None,
+                   "line_items": [item],
+                   "office_note": record.get("office_note", ""),
+                   "receipts": _receipts(record),
+                   "send_to": (record["send_to"], record.get("send_to_note",
+                                                             ""))
+                              if record.get("send_to") else None}
+    if current is not None:
+        yield current
+
+def _same_rfp(first, record, row):
+    """
+    Return True if the CSV row `record` (number `row`) belongs to the same
+    RFP as the row `first` that began it.
+    """
+    rfp_id = record.get("rfp_id")
+    if rfp_id or first.get("rfp_id"):
+        if rfp_id != first.get("rfp_id"):
+            return False
+        conflicts = _conflicts(first, record)
+        if conflicts:
+            raise ValueError("row %d disagrees with the first row of RFP %s "
+                             "on %s" % (row, rfp_id, ", ".join(conflicts)))
+        return True
+    return bool(record.get("name")) and \
+           record.get("name") == first.get("name") and \
+           not _conflicts(first, record)
+
+def _conflicts(first, record):
+    """
+    Return the RFP columns that are set in `record` to a value other than
+    that in `first`.
+    """
+    conflicts = []
+    for key in RFP_COLUMNS:
+        val = (record.get(key) or "").strip()
+        if not val:
+            continue
+        if key == "is_mit":
+            same = _boolean(val) == _boolean(first.get(key))
+        else:
+            same = val == (first.get(key) or "").strip()
+        if not same:
+            conflicts.append(key)
+    return conflicts
+
+def _receipts(record):
+    return [r for r in (record.get("receipts") or "").split(";") if r]
+
+def _create_kwargs(record):
+    kwargs = dict(record)
+    for key in ("payee", "address", "send_to"):
+        if kwargs.get(key) is not None:
+            kwargs[key] = tuple(kwargs[key])
+    kwargs["line_items"] = [tuple(li) for li in kwargs.get("line_items", ())]
+    return kwargs
+
+def _view_items(records):
+    for record in records:
+        yield record if isinstance(record, basestring) \
+              else record["rfp_number"]
+
+def _read(stream, fmt):
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield dict((key, (val or "").decode("utf-8"))
+                       for key, val in row.items() if key)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def _cell(val):
+    if isinstance(val, unicode):
+        return val.encode("utf-8")
+    if isinstance(val, (list, tuple, dict)):
+        return json.dumps(val, default=str)
+    return val
+
+def _boolean(val):
+    return ("%s" % (val,)).strip().lower() in ("1", "true", "yes", "y")
+
+def _format_of(path):
+    for fmt, extensions in (("csv", (".csv",)), ("jsonl", (".jsonl", ".json"))):
+        if path.lower().endswith(extensions):
+            return fmt
+    return None
+
+class _open(object):
+    """
+    Open a file, or use stdin or stdout for '-', in a `with` statement.
+    """
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.file = None
+
+    def __enter__(self):
+        if self.path == "-":
+            return sys.stdin if "r" in self.mode else sys.stdout
+        self.file = open(self.path, self.mode + "b")
+        return self.file
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            self.file.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
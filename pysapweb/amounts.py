@@ -0,0 +1,53 @@
+"""
+    amounts
+    ~~~~~~~
+
+    The `amounts` module converts between the dollar amounts displayed by
+    SAPweb and exact integer numbers of cents.
+"""
+
+import re
+from decimal import Decimal, InvalidOperation
+
+_NOISE = re.compile(r"[\s$,]|USD")
+
+def parse_cents(text):
+    """
+    Parse a displayed amount such as '$1,234.50', '1234.5' or '(12.00)' into
+    an integer number of cents. Parentheses and a leading or trailing minus
+    sign denote a negative amount. Return None for an empty or unparseable
+    value, including NaN and infinities:
+
+    >>> parse_cents("$1,234.50"), parse_cents("(12.00)"), parse_cents("1.5-")
+    (123450, -1200, -150)
+    >>> parse_cents("nan"), parse_cents("inf"), parse_cents("-Infinity")
+    (None, None, None)
+    >>> parse_cents(float("nan")), parse_cents("")
+    (None, None)
+    """
+    if text is None:
+        return None
+    text = _NOISE.sub("", "%s" % (text,))
+    negative = False
+    if text.startswith("(") and text.endswith(")"):
+        negative, text = True, text[1:-1]
+    if text.endswith("-"):
+        negative, text = True, text[:-1]
+    if text.startswith("-"):
+        negative, text = not negative, text[1:]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not amount.is_finite():
+        return None
+    cents = int((amount * 100).to_integral_value())
+    return -cents if negative else cents
+
+def format_cents(cents):
+    """
+    Format an integer number of cents as SAPweb expects amounts to be entered,
+    e.g. 123450 as '1234.50'.
+    """
+    sign = "-" if cents < 0 else ""
+    return "%s%d.%02d" % (sign, abs(cents) // 100, abs(cents) % 100)
@@ -0,0 +1,574 @@
+"""
+    benchmark
+    ~~~~~~~~~
+
+    The `benchmark` module measures how many WebDriver commands the public
+    API sends, and how long it takes, without a browser or a network
+    connection. Each scenario drives the `rfp` page objects against a
+    :class:`FakeDriver`, which serves generated SAPweb pages and charges a
+    fixed latency for every command::
+
+        python -m pysapweb.benchmark --latency 0.05 --sizes 1,10,100
+        python -m pysapweb.benchmark view inbox.table -o after.json \\
+            --baseline before.json
+
+    For every scenario and size, the number of round trips to the browser,
+    the time they would take at the given latency and the wall time spent in
+    Python are printed. Results saved with `-o` can be given as `--baseline`
+    to a later run to compare the two. With `--sleep`, the driver really
+    waits out the latency, so wall time includes it.
+
+    Requires `lxml` and `cssselect`, as :class:`dom.StaticDocument` does
+    (the `static` extra), but not Selenium.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from pysapweb import dom, rfp
+
+class FakeDriver(object):
+    """
+    A stand-in for a WebDriver instance that serves the pages of a
+    :class:`FakeSAPweb`. Every call that would be a request to a real
+    browser is counted in `commands`, by Selenium command name, and costs
+    `latency` seconds of simulated time (also of real time if `sleep` is
+    True).
+    """
+    def __init__(self, site, latency=0.0, sleep=False):
+        self.site = site
+        self.latency = latency
+        self.sleep = sleep
+        self.commands = Counter()
+
+    @property
+    def round_trips(self):
+        return sum(self.commands.values())
+
+    @property
+    def simulated(self):
+        """
+        Seconds the commands sent so far would have taken at `latency`.
+        """
+        return self.round_trips * self.latency
+
+    def command(self, name):
+        self.commands[name] += 1
+        if self.sleep and self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def title(self):
+        self.command("getTitle")
+        return self.site.document.title
+
+    @property
+    def current_url(self):
+        self.command("getCurrentUrl")
+        return self.site.document.url
+
+    @property
+    def page_source(self):
+        self.command("getPageSource")
+        return self.site.source()
+
+    def get(self, url):
+        self.command("get")
+        self.site.get(url)
+
+    def execute_script(self, script, *args):
+        self.command("executeScript")
+        args = [arg.element if isinstance(arg, FakeElement) else arg
+                for arg in args]
+        return self.site.execute(script, args)
+
+    def find_element(self, by, value):
+        self.command("findElement")
+        return _first(self, self.site.document, by, value)
+
+    def find_elements(self, by, value):
+        self.command("findElements")
+        return [FakeElement(self, e)
+                for e in self.site.document.find_all(by, value)]
+
+    def quit(self):
+        pass
+
+class FakeElement(object):
+    """
+    A stand-in for a WebElement, backed by a :class:`dom.StaticElement` of
+    the current fake page.
+    """
+    def __init__(self, parent, element):
+        self.parent = parent
+        self.element = element
+
+    @property
+    def text(self):
+        self.parent.command("getElementText")
+        return self.element.text
+
+    @property
+    def tag_name(self):
+        self.parent.command("getElementTagName")
+        return self.element.tag_name
+
+    def get_attribute(self, name):
+        self.parent.command("getElementAttribute")
+        return self.element.get_attribute(name)
+
+    def is_selected(self):
+        self.parent.command("isElementSelected")
+        return self.element.is_selected()
+
+    def is_displayed(self):
+        self.parent.command("isElementDisplayed")
+        return self.element.is_displayed()
+
+    def click(self):
+        self.parent.command("clickElement")
+        self.parent.site.click(self.element)
+
+    def clear(self):
+        self.parent.command("clearElement")
+        self.element.clear()
+
+    def send_keys(self, *value):
+        self.parent.command("sendKeysToElement")
+        self.element.send_keys(*value)
+
+    def find_element(self, by, value):
+        self.parent.command("findChildElement")
+        return _first(self.parent, self.element, by, value)
+
+    def find_elements(self, by, value):
+        self.parent.command("findChildElements")
+        return [FakeElement(self.parent, e)
+                for e in self.element.find_all(by, value)]
+
+def _first(driver, node, by, value):
+    elements = node.find_all(by, value)
+    if not elements:
+        raise dom.NoSuchElementException("Unable to locate element: %s" %
+                                         value)
+    return FakeElement(driver, elements[0])
+
+class FakeSAPweb(object):
+    """
+    Generated SAPweb pages, with just enough behaviour for the `rfp` page
+    objects: navigation to the entry pages, the buttons and links that lead
+    from page to page, and the scripts `rfp` and `dom` run in the page.
+
+    :param line_items: line items shown on an RFP
+    :param rows: RFPs in the inbox
+    :param results: RFPs found by a search without an RFP number
+    """
+    def __init__(self, line_items=1, rows=10, results=10):
+        self.line_items = line_items
+        self.rows = rows
+        self.results = results
+        self.next_rfp = 10000001
+        self.rfp_number = None
+        self.document = None
+        self.scripts = {
+            dom._TEXTS_JS: self._texts,
+            dom._FINGERPRINT_JS: lambda selector:
+                self.document.fingerprint(selector),
+            dom._READ_FIELDS_JS: lambda fields:
+                self.document.read_fields(fields),
+            dom._WRITE_FIELDS_JS: lambda fields:
+                self.document.write_fields(fields),
+            rfp.RequestRfpPage._SET_LINE_ITEMS_JS: self._set_line_items,
+            rfp.InboxPage._MARK_FOR_DELETION_JS: self._mark_for_deletion,
+        }
+
+    def source(self):
+        import lxml.html
+        return lxml.html.tostring(self.document.root, encoding="unicode")
+
+    def load(self, title, body, url):
+        self.document = dom.StaticDocument(
+            u"<html><head><title>%s</title></head><body>%s</body></html>" %
+            (title, body), url=url)
+
+    def get(self, url):
+        if "InboxEntry" in url:
+            self.load("RFP Inbox", _inbox(self.rows), url)
+        elif "SearchEntry" in url:
+            self.load("Search for RFP", _search_form(), url)
+        elif "SelectPayee" in url:
+            self.load("Select Payee", _select_payee(), url)
+        else:
+            raise ValueError("No fake page at %s" % url)
+
+    def click(self, element):
+        """
+        Act on a click on `element`, a :class:`dom.StaticElement` of the
+        current page.
+        """
+        elem = element.element
+        ident = elem.get("id")
+        classes = (elem.get("class") or "").split()
+        href = elem.get("href") or ""
+        title = self.document.title
+        if elem.tag == "option" or elem.get("type") in ("radio", "checkbox"):
+            element.click()
+        elif title == "Select Payee" and ident == "searchButton":
+            self.load(title, _select_payee(results=True), "SearchPayee.action")
+        elif title == "Select Payee" and elem.getparent().get("id") == "mit":
+            self.load("Create RFP Reimbursement", _request_rfp(),
+                      "SelectPayee.action")
+        elif ident == "addLine":
+            count = len(self.document.css_all(".lineItem"))
+            elem.addprevious(_fragment(_request_line(count)))
+        elif "saveAction" in classes and title == "Create RFP Reimbursement":
+            self.rfp_number = "%d" % self.next_rfp
+            self.next_rfp += 1
+            self._edit(overlay=True)
+        elif "attachReceipts" in classes:
+            self._edit(overlay=True)
+        elif elem.tag == "button" and element.text in ("Attach", "Cancel"):
+            self._edit(overlay=False)
+        elif title == "Search for RFP" and ident == "searchButton":
+            number = self.document.css("#rfpNumber").get_attribute("value")
+            if number:
+                self._display(number)
+            else:
+                self.load(title, _search_form(self.results), "Search.action")
+        elif href.startswith("SearchDrillDown"):
+            self._display(rfp.normalize_rfp_number(element.text))
+        else:
+            raise ValueError("No fake behaviour for a click on <%s id=%r "
+                             "class=%r> on %s" %
+                             (elem.tag, ident, elem.get("class"), title))
+
+    def execute(self, script, args):
+        if script not in self.scripts:
+            raise ValueError("No fake implementation of script: %s" %
+                             script.strip().splitlines()[0])
+        return self.scripts[script](*args)
+
+    def _edit(self, overlay):
+        self.load("RFP Reimbursement", _edit_rfp(self.rfp_number, overlay),
+                  "ViewEdit.action")
+
+    def _display(self, number):
+        self.load("Display RFP", _display_rfp(number, self.line_items),
+                  "SearchDrillDown.action")
+
+    def _texts(self, root, selector):
+        node = self.document if root is None else root
+        return [text.strip() for text in node.texts(selector)]
+
+    def _set_line_items(self, items):
+        document = self.document
+        add = document.css("#addLine").element
+        count = len(document.css_all(".lineItem"))
+        while count < len(items):
+            add.addprevious(_fragment(_request_line(count)))
+            count += 1
+        fields = []
+        for i in range(count):
+            for j, prefix in enumerate(_LINE_ITEM_PREFIXES):
+                value = items[i][j] if i < len(items) else ""
+                fields.append((dom.INPUT, "#%s-%d" % (prefix, i), value))
+        document.write_fields(fields)
+
+    def _mark_for_deletion(self, rfps):
+        marked = []
+        for link in self.document.css_all("td.data > a"):
+            boxes = link.xpath_all("../..//input[@type='checkbox']")
+            if not boxes:
+                continue
+            wanted = [number for number in rfps if number in link.text][:1]
+            cells = link.xpath_all("../../td")
+            if wanted and cells[9].text.strip() != "n/a":
+                if not boxes[0].is_selected():
+                    boxes[0].click()
+                marked.append(wanted[0])
+            elif boxes[0].is_selected():
+                boxes[0].click()
+        return marked
+
+_LINE_ITEM_PREFIXES = ("serviceDate", "glAccount", "costObject", "amount",
+                       "description")
+
+def _fragment(html):
+    import lxml.html
+    return lxml.html.fragment_fromstring(html)
+
+def _datalist(rows):
+    return u"<table>%s</table>" % u"".join(
+        u"<tr><th>%s</th><td>%s</td></tr>" % row for row in rows)
+
+def _inbox(rows):
+    body = []
+    for i in range(rows):
+        body.append(
+            u"<tr><td><input type='checkbox'/></td>"
+            u"<td class='data'><a href='Select.action?i=%d'>%d</a></td>"
+            u"<td>%s</td><td><img alt='SAVED'/></td><td>01/%02d/2014</td>"
+            u"<td>Payee %d</td><td>tbeaver</td><td>1234567</td>"
+            u"<td>%d.00</td><td>%s</td></tr>" %
+            (i, 20000000 + i, "Yes" if i % 2 else "No", i % 28 + 1, i,
+             10 + i, "n/a" if i % 3 == 0 else ""))
+    return (u"<table>%s</table><button class='deleteButton'>Delete "
+            u"Selected</button>" % u"".join(body))
+
+def _search_form(results=0):
+    fields = u"".join(
+        u"<input type='checkbox' id='%s'/>" % name
+        for name in ("parked", "posted", "deleted"))
+    fields += (u"<select id='coCode'><option value='CUR' selected='selected'>"
+               u"MIT</option><option value='LL'>Lincoln</option></select>")
+    fields += u"".join(
+        u"<input type='text' id='%s'/>" % name
+        for name in ("rfpNumber", "creationStartDate", "creationEndDate",
+                     "payee", "filingLabel", "costObject", "glAccount"))
+    rows = u"".join(
+        u"<tr><td class='data'><a href='SearchDrillDown.action?i=%d'>"
+        u"0%d</a></td><td>01/%02d/2014</td><td>Payee %d</td><td>tbeaver</td>"
+        u"<td>RFP %d</td><td>Posted</td><td>1234567</td><td>%d.00</td></tr>" %
+        (i, 30000000 + i, i % 28 + 1, i, i, 10 + i) for i in range(results))
+    return (u"<form>%s<button id='searchButton'>Search</button></form>"
+            u"<table>%s</table>" % (fields, rows))
+
+def _select_payee(results=False):
+    found = u""
+    if results:
+        found = (u"<div id='mit'><a href='#'>Tim D. Beaver "
+                 u"(tbeaver,Mechanical Engineering)</a></div>")
+    return (u"<input type='radio' name='payeeType' value='MIT' "
+            u"checked='checked'/><input type='radio' name='payeeType' "
+            u"value='NONMIT'/><input type='text' id='payeeName'/>"
+            u"<button id='searchButton'>Search</button>%s" % found)
+
+def _request_line(i):
+    return (u"<div class='lineItem'>%s<textarea id='description-%d'>"
+            u"</textarea></div>" %
+            (u"".join(u"<input type='text' id='%s-%d'/>" % (prefix, i)
+                      for prefix in _LINE_ITEM_PREFIXES[:-1]), i))
+
+def _request_rfp():
+    options = (u"<option value='US'>United States</option>"
+               u"<option value='CA'>Canada</option>")
+    regions = (u"<option value='MA'>Massachusetts</option>"
+               u"<option value='NY'>New York</option>")
+    return (u"<select id='coCode'><option value='CUR' selected='selected'>"
+            u"MIT</option></select><input type='text' id='rfpName'/>"
+            u"<select id='country2'>%s</select>"
+            u"<input type='text' id='address2'/><input type='text' id='city2'/>"
+            u"<select id='region2'>%s</select><input type='text' id='zip2'/>"
+            u"<input type='text' id='ssnTin'/>%s"
+            u"<button id='addLine'>Add Line</button>"
+            u"<textarea id='messageForAP'></textarea>"
+            u"<button class='saveAction'>Save &amp; Continue</button>" %
+            (options, regions, _request_line(0)))
+
+def _edit_rfp(number, overlay):
+    style = u"" if overlay else u" style='display: none'"
+    return (u"%s<button class='attachReceipts'>Attach Receipt</button>"
+            u"<button class='saveAction'>Save</button>"
+            u"<button class='sendToAction'>Send to</button>"
+            u"<div class='ui-dialog'%s><input type='file' id='upload'/>"
+            u"<div id='doUpload'>Upload</div><button>Attach</button>"
+            u"<button>Cancel</button></div>" %
+            (_datalist([(u"RFP Number", number),
+                        (u"Payee", u"Tim D. Beaver"),
+                        (u"Charge to", u"MIT")]), style))
+
+def _display_rfp(number, line_items):
+    details = _datalist([(u"Inbox", u"Central Office"),
+                         (u"RFP Number", number),
+                         (u"Payee", u"Tim D. Beaver"),
+                         (u"Company Code", u"CUR"),
+                         (u"Name of RFP", u"Benchmark"),
+                         (u"Type of RFP", u"Reimbursement"),
+                         (u"Payment Method", u"Check")])
+    lines = u"".join(
+        u"<div class='lineItem'><table><tr><td>01/%02d/2014</td>"
+        u"<td>420050</td><td>1234567</td><td>%d.00</td></tr></table>"
+        u"<div class='data indent1'>Line %d</div></div>" %
+        (i % 28 + 1, 10 + i, i) for i in range(line_items))
+    history = (u"<table class='topHeadersTable'><tr><td>01/02/2014</td>"
+               u"<td>10:00 AM</td><td>Created by tbeaver</td></tr></table>")
+    note = (u"<h3>Note to Central Office</h3>"
+            u"<div class='sectionContainer'>Thanks</div>")
+    return details + lines + note + history
+
+class Scenario(namedtuple("Scenario", "description site run")):
+    """
+    A benchmark: `site` maps a size to the keyword arguments of
+    :class:`FakeSAPweb`, and `run` drives the browser, given the browser, the
+    size and a list of `size` receipt files, each with different contents.
+    """
+    __slots__ = ()
+
+def _create(browser, line_items, receipts):
+    rfp.create(browser, name="Benchmark", payee=(True, "Tim Beaver"),
+               address=("77 Massachusetts Ave", "Cambridge", "MA", "02139",
+                        "US"),
+               line_items=[("01/02/2014", "420050", "1234567", "10.00",
+                            "Line %d" % i) for i in range(line_items)],
+               office_note="Thanks", receipts=receipts)
+
+def _inbox_cells(browser):
+    page = rfp.InboxPage(browser)
+    for number in page.list():
+        page.payee(number)
+        page.amount(number)
+
+def _search(browser):
+    page = rfp.SearchPage(browser)
+    page.rfp_types(parked=True, posted=True)
+    page.cost_object("1234567")
+    return page.search()
+
+#: Scenarios by name. The size N of each is given in its description.
+SCENARIOS = OrderedDict([
+    ("create.line_items", Scenario(
+        "rfp.create() with N line items and one receipt",
+        lambda n: {},
+        lambda browser, n, receipts: _create(browser, n, receipts[:1]))),
+    ("create.receipts", Scenario(
+        "rfp.create() with one line item and N receipts",
+        lambda n: {},
+        lambda browser, n, receipts: _create(browser, 1, receipts))),
+    ("create.duplicate_receipts", Scenario(
+        "rfp.create() with one line item and N copies of one receipt",
+        lambda n: {},
+        lambda browser, n, receipts: _create(browser, 1, receipts[:1] * n))),
+    ("view", Scenario(
+        "rfp.view() of an RFP with N line items",
+        lambda n: {"line_items": n},
+        lambda browser, n, receipts: rfp.view(browser, "10000001"))),
+    ("inbox.table", Scenario(
+        "InboxPage.table() with N rows",
+        lambda n: {"rows": n},
+        lambda browser, n, receipts: rfp.InboxPage(browser).table())),
+    ("inbox.cells", Scenario(
+        "InboxPage.payee() and amount() of each of N rows",
+        lambda n: {"rows": n},
+        lambda browser, n, receipts: _inbox_cells(browser))),
+    ("search.result_table", Scenario(
+        "SearchPage.search() and result_table() with N results",
+        lambda n: {"results": n},
+        lambda browser, n, receipts: _search(browser).result_table())),
+    ("search.results", Scenario(
+        "SearchPage.search() and results() with N results",
+        lambda n: {"results": n},
+        lambda browser, n, receipts: _search(browser).results())),
+])
+
+class Result(namedtuple("Result", "scenario size round_trips simulated wall "
+                                  "commands")):
+    """
+    The cost of one scenario at one size: round trips to the browser, the
+    seconds they would take at the given latency, the least wall time of the
+    repeats and the number of each command sent.
+    """
+    __slots__ = ()
+
+def run(name, size, latency=0.0, repeat=3, sleep=False):
+    """
+    Run the scenario `name` at `size` `repeat` times and return a
+    :class:`Result`.
+    """
+    scenario = SCENARIOS[name]
+    workdir = tempfile.mkdtemp(prefix="pysapweb-benchmark-")
+    try:
+        receipts = []
+        for i in range(size):
+            path = os.path.join(workdir, "receipt%d.pdf" % i)
+            with open(path, "wb") as f:
+                f.write(b"%PDF-1.4\n" * 64 + b"%% receipt %d\n" % i)
+            receipts.append(path)
+        best = None
+        for _ in range(repeat):
+            driver = FakeDriver(FakeSAPweb(**scenario.site(size)), latency,
+                                sleep)
+            start = time.time()
+            scenario.run(driver, size, receipts)
+            wall = time.time() - start
+            if best is None or wall < best:
+                best = wall
+        return Result(name, size, driver.round_trips, driver.simulated, best,
+                      dict(driver.commands))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main(argv=None):
+    """
+    Run the benchmarks given by `argv` (by default, sys.argv) and print
+    the results. Return the exit status.
+    """
+    args = _parser().parse_args(argv)
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.stderr.write("Unknown scenarios: %s\nChoose from: %s\n" %
+                         (", ".join(unknown), ", ".join(SCENARIOS)))
+        return 2
+    sizes = [int(size) for size in args.sizes.split(",")]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            for result in json.load(f)["results"]:
+                baseline[(result["scenario"], result["size"])] = result
+    out = sys.stdout
+    out.write("%-25s %6s %11s %11s %10s%s\n" %
+              ("scenario", "size", "round trips", "simulated s", "wall s",
+               "  vs baseline" if baseline else ""))
+    results = []
+    for name in names:
+        for size in sizes:
+            result = run(name, size, args.latency, args.repeat, args.sleep)
+            results.append(result)
+            line = "%-25s %6d %11d %11.3f %10.4f" % (
+                name, size, result.round_trips, result.simulated, result.wall)
+            before = baseline.get((name, size))
+            if before is not None:
+                line += "  %+d round trips, wall x%.2f" % (
+                    result.round_trips - before["round_trips"],
+                    result.wall / before["wall"] if before["wall"] else 0)
+            out.write(line + "\n")
+            out.flush()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"latency": args.latency, "sleep": args.sleep,
+                       "results": [r._asdict() for r in results]},
+                      f, indent=2, sort_keys=True)
+    return 0
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m pysapweb.benchmark",
+        description="Count the WebDriver commands and time taken by the "
+                    "pysapweb API against a fake SAPweb.",
+        epilog="Scenarios: " + "; ".join("%s: %s" % (name, s.description)
+                                          for name, s in SCENARIOS.items()))
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help="scenarios to run (default: all)")
+    parser.add_argument("-l", "--latency", type=float, default=0.05,
+                        help="seconds charged per command (default: 0.05)")
+    parser.add_argument("-s", "--sizes", default="1,10,50",
+                        help="comma-separated values of N (default: 1,10,50)")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="runs per scenario and size; the fastest is "
+                             "reported (default: 3)")
+    parser.add_argument("--sleep", action="store_true",
+                        help="really wait out the latency of each command")
+    parser.add_argument("-o", "--output",
+                        help="save the results as JSON")
+    parser.add_argument("--baseline",
+                        help="compare with results saved by an earlier run")
+    return parser
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+    checkpoint
+    ~~~~~~~~~~
+
+    The `checkpoint` module records the progress of :func:`rfp.create`, so
+    that a failed call can be retried without creating a duplicate RFP::
+
+        progress = checkpoint.Checkpoint("rfp-42.json")
+        rfp.create(browser, ..., checkpoint=progress)
+
+    If the call fails after the RFP was saved, calling :func:`rfp.create`
+    again with the same checkpoint picks up from the step that failed.
+
+    Receipts are recognized by a hash of their contents, so a file attached
+    by an earlier attempt is not uploaded again, even under another name.
+    Receipts skipped for that reason are listed in :attr:`Checkpoint.skipped`.
+"""
+
+import binascii
+import hashlib
+import json
+import os
+
+class Checkpoint(object):
+    """
+    The steps completed for one RFP. The idempotency `key` is added to the RFP
+    name, so the RFP can be found through search even if the process dies
+    before its number is recorded. If `path` is given, the checkpoint is
+    loaded from that file if it exists and saved to it after every step.
+    """
+    def __init__(self, path=None, key=None):
+        self.path = path
+        self.key = key or binascii.hexlify(os.urandom(4)).decode("ascii")
+        self.rfp_number = None
+        self.receipts = []
+        # content digest -> receipt attached with those contents
+        self.digests = {}
+        # [receipt, duplicate_of] pairs
+        self.skipped = []
+        self.sent = False
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.__dict__.update(json.load(f))
+
+    def tag(self, name):
+        """
+        Return the RFP name with the idempotency key appended.
+        """
+        suffix = "[%s]" % self.key
+        if name.endswith(suffix):
+            return name
+        return ("%s %s" % (name, suffix)).strip()
+
+    def record(self, **steps):
+        """
+        Update the given fields, e.g. `rfp_number` or `sent`, and save.
+        """
+        self.__dict__.update(steps)
+        self.save()
+
+    def attached(self, receipt, digest=None):
+        """
+        Record that `receipt`, whose contents have the given
+        :func:`file_digest`, has been attached, and save.
+        """
+        self.receipts.append(receipt)
+        if digest is not None:
+            self.digests[digest] = receipt
+        self.save()
+
+    def is_attached(self, receipt, digest=None):
+        """
+        Return True if `receipt`, or a file with the given digest, was
+        attached by an earlier attempt.
+        """
+        return receipt in self.receipts or digest in self.digests
+
+    def skip(self, receipt, duplicate_of):
+        """
+        Record that `receipt` was not attached because it has the same
+        contents as `duplicate_of`, and save.
+        """
+        if [receipt, duplicate_of] not in self.skipped:
+            self.skipped.append([receipt, duplicate_of])
+            self.save()
+
+    def save(self):
+        """
+        Write the checkpoint to `path`, if set. The file is replaced
+        atomically, so a crash never leaves it half-written.
+        """
+        if self.path is None:
+            return
+        state = {"key": self.key, "rfp_number": self.rfp_number,
+                 "receipts": self.receipts, "digests": self.digests,
+                 "skipped": self.skipped, "sent": self.sent}
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(state, f)
+        os.rename(temp, self.path)
+
+def file_digest(path):
+    """
+    Return the SHA-256 hash of the contents of the file at `path`, in hex.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
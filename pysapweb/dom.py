@@ -0,0 +1,594 @@
+"""
+    dom
+    ~~~
+
+    The `dom` module defines the document interface used by the `rfp` page
+    objects, so that the same page classes can drive a live browser or read a
+    stored page. :class:`SeleniumDocument` forwards to a WebDriver instance;
+    :class:`StaticDocument` evaluates the same CSS and XPath selectors against
+    HTML parsed with `lxml`, which is much faster for read-only pages::
+
+        page = rfp.ViewOnlyPage(dom.StaticDocument.from_file("rfp.html"))
+        page.line_item_count()
+
+    :class:`StaticDocument` requires `lxml` and `cssselect`, installed with
+    the `static` extra. Neither they nor Selenium are imported until a
+    document that needs them is used.
+"""
+
+import hashlib
+import sys
+
+# Locator strategies, with the same values as selenium's `By`
+CSS = "css selector"
+XPATH = "xpath"
+
+# Kinds of form field for read_fields() and write_fields(), with the locator
+# each takes: a text box or text area (CSS), a select (CSS; read as the text
+# of the selected option, written by option value), a radio button group
+# (its name), a checkbox (CSS) and read-only text (XPath)
+INPUT = "input"
+SELECT = "select"
+RADIO = "radio"
+CHECKBOX = "checkbox"
+TEXT = "text"
+
+class NoSuchElementException(Exception):
+    """
+    Raised when no element matches a locator. Errors from a live browser are
+    raised as a subclass of both this class and Selenium's own
+    NoSuchElementException.
+    """
+
+class Node(object):
+    """
+    Common query methods for documents and elements. Subclasses implement
+    :meth:`find_all`.
+    """
+    def find_all(self, by, value):
+        """
+        Return a list of elements matching the locator, which may be empty.
+        """
+        raise NotImplementedError
+
+    def find(self, by, value):
+        """
+        Return the first element matching the locator. Raise a
+        NoSuchElementException if there is none.
+        """
+        elements = self.find_all(by, value)
+        if not elements:
+            raise NoSuchElementException("Unable to locate element: %s" %
+                                         value)
+        return elements[0]
+
+    def css(self, selector):
+        return self.find(CSS, selector)
+
+    def css_all(self, selector):
+        return self.find_all(CSS, selector)
+
+    def xpath(self, xpath):
+        return self.find(XPATH, xpath)
+
+    def xpath_all(self, xpath):
+        return self.find_all(XPATH, xpath)
+
+    def texts(self, selector):
+        """
+        Return the text of every element matching the CSS selector.
+        """
+        return [e.text for e in self.css_all(selector)]
+
+class Document(Node):
+    """
+    A loaded page. Provides `title`, `url` and `source` as well as the query
+    methods of :class:`Node`.
+    """
+    title = None
+    url = None
+    source = None
+
+    def get(self, url):
+        """
+        Navigate to the given URL.
+        """
+        raise NotImplementedError
+
+    def execute(self, script, *args):
+        """
+        Run JavaScript in the page and return its result.
+        """
+        raise NotImplementedError
+
+    def read_fields(self, fields):
+        """
+        Return the values of several form fields, given as a list of (kind,
+        locator) pairs, e.g. (SELECT, '#country'). A field that is not on the
+        page reads as None.
+        """
+        values = []
+        for kind, locator in fields:
+            try:
+                values.append(_read_field(self, kind, locator))
+            except NoSuchElementException:
+                values.append(None)
+        return values
+
+    def write_fields(self, fields):
+        """
+        Set several form fields, given as a list of (kind, locator, value)
+        tuples, in order. Return the indices of the fields that could not be
+        found, which are skipped.
+        """
+        missing = []
+        for i, (kind, locator, value) in enumerate(fields):
+            try:
+                _write_field(self, kind, locator, value)
+            except NoSuchElementException:
+                missing.append(i)
+        return missing
+
+    def snapshot(self):
+        """
+        Return a :class:`StaticDocument` of the page as it is now. Reading
+        many values from the snapshot costs a single request to the browser.
+        """
+        return StaticDocument(self.source, self.title, self.url)
+
+    def fingerprint(self, selector="body"):
+        """
+        Return a short string that changes whenever the content or the form
+        values of the element matching the CSS selector change.
+        """
+        return hashlib.sha1(self.source.encode("utf-8")).hexdigest()
+
+class Element(Node):
+    """
+    An element of a :class:`Document`. Provides `text` and `tag_name` as well
+    as the query methods of :class:`Node`.
+    """
+    text = None
+    tag_name = None
+
+    def get_attribute(self, name):
+        raise NotImplementedError
+
+    def is_selected(self):
+        raise NotImplementedError
+
+    def is_displayed(self):
+        raise NotImplementedError
+
+    def click(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def send_keys(self, *value):
+        raise NotImplementedError
+
+def _read_field(node, kind, locator):
+    if kind == INPUT:
+        return node.css(locator).get_attribute("value")
+    elif kind == SELECT:
+        return node.css("%s option:checked" % locator).text.strip()
+    elif kind == RADIO:
+        selector = "input[type='radio'][name='%s']:checked" % locator
+        return node.css(selector).get_attribute("value")
+    elif kind == CHECKBOX:
+        return node.css(locator).is_selected()
+    elif kind == TEXT:
+        return node.xpath(locator).text
+    raise ValueError("Unknown field kind: %s" % kind)
+
+def _write_field(node, kind, locator, value):
+    if kind == INPUT:
+        elem = node.css(locator)
+        elem.clear()
+        elem.send_keys(value)
+    elif kind == SELECT:
+        option = node.css("%s option[value='%s']" % (locator, value))
+        if not option.is_selected():
+            option.click()
+    elif kind == RADIO:
+        node.css("input[type='radio'][name='%s'][value='%s']" %
+                 (locator, value)).click()
+    elif kind == CHECKBOX:
+        elem = node.css(locator)
+        if elem.is_selected() != value:
+            elem.click()
+    else:
+        raise ValueError("Field kind %s cannot be written" % kind)
+
+def _local_scripts():
+    """
+    Return the scripts that :class:`SeleniumDocument` runs for operations
+    every :class:`Document` also implements without a browser.
+    """
+    return frozenset([_TEXTS_JS, _FINGERPRINT_JS, _READ_FIELDS_JS,
+                      _WRITE_FIELDS_JS])
+
+def document(browser):
+    """
+    Return a :class:`Document` for `browser`, which may be a WebDriver
+    instance or already a Document.
+    """
+    if isinstance(browser, Document):
+        return browser
+    return SeleniumDocument(browser)
+
+# Reads the text of all matches in one round trip instead of one per element
+_TEXTS_JS = """
+    var root = arguments[0] || document, texts = [];
+    var elements = root.querySelectorAll(arguments[1]);
+    for (var i = 0; i < elements.length; i++) {
+        texts.push((elements[i].innerText || "").trim());
+    }
+    return texts;
+"""
+
+# Hashes the markup and form values of a region of the page (FNV-1a), so the
+# page can be compared without transferring it
+_FINGERPRINT_JS = """
+    var root = document.querySelector(arguments[0]) || document.documentElement;
+    var parts = [document.title, root.innerHTML];
+    var fields = root.querySelectorAll("input, select, textarea");
+    for (var i = 0; i < fields.length; i++) {
+        var field = fields[i];
+        parts.push(field.type == "checkbox" || field.type == "radio" ?
+                   field.checked : field.value);
+    }
+    var text = parts.join("\\u0000"), hash = 0x811c9dc5;
+    for (var i = 0; i < text.length; i++) {
+        hash = Math.imul(hash ^ text.charCodeAt(i), 0x01000193) >>> 0;
+    }
+    return hash.toString(16) + ":" + text.length;
+"""
+
+# Reads form fields as in Document.read_fields(), in one round trip
+_READ_FIELDS_JS = """
+    var fields = arguments[0], values = [];
+    for (var i = 0; i < fields.length; i++) {
+        var kind = fields[i][0], locator = fields[i][1], value = null, elem;
+        if (kind == "text") {
+            elem = document.evaluate(locator, document, null,
+                XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+            if (elem) value = (elem.innerText || "").trim();
+        } else if (kind == "radio") {
+            var radios = document.querySelectorAll("input[type='radio']");
+            for (var j = 0; j < radios.length; j++) {
+                if (radios[j].name == locator && radios[j].checked) {
+                    value = radios[j].value;
+                }
+            }
+        } else {
+            elem = document.querySelector(locator);
+            if (elem && kind == "input") {
+                value = elem.value;
+            } else if (elem && kind == "checkbox") {
+                value = elem.checked;
+            } else if (elem && kind == "select") {
+                var option = elem.querySelector("option:checked");
+                if (option) value = option.text.trim();
+            }
+        }
+        values.push(value);
+    }
+    return values;
+"""
+
+# Writes form fields as in Document.write_fields(), in one round trip, firing
+# the events SAPweb's scripts listen for
+_WRITE_FIELDS_JS = """
+    var fields = arguments[0], missing = [];
+    function fire(elem, names) {
+        for (var k = 0; k < names.length; k++) {
+            var event = document.createEvent("HTMLEvents");
+            event.initEvent(names[k], true, false);
+            elem.dispatchEvent(event);
+        }
+    }
+    for (var i = 0; i < fields.length; i++) {
+        var kind = fields[i][0], locator = fields[i][1], value = fields[i][2];
+        var elem = null;
+        if (kind == "radio") {
+            var radios = document.querySelectorAll("input[type='radio']");
+            for (var j = 0; j < radios.length; j++) {
+                if (radios[j].name == locator && radios[j].value == value) {
+                    elem = radios[j];
+                }
+            }
+        } else {
+            elem = document.querySelector(locator);
+        }
+        if (elem && kind == "select") {
+            var select = elem;
+            elem = null;
+            for (var j = 0; j < select.options.length; j++) {
+                if (select.options[j].value == value) {
+                    elem = select.options[j];
+                }
+            }
+        }
+        if (!elem) {
+            missing.push(i);
+        } else if (kind == "input") {
+            elem.value = value;
+            fire(elem, ["input", "change", "blur"]);
+        } else if (kind == "select") {
+            if (!elem.selected) {
+                elem.selected = true;
+                fire(select, ["change"]);
+            }
+        } else if (kind == "radio") {
+            elem.click();
+        } else if (kind == "checkbox") {
+            if (elem.checked != value) elem.click();
+        }
+    }
+    return missing;
+"""
+
+class SeleniumDocument(Document):
+    """
+    A document backed by a WebDriver instance.
+    """
+    def __init__(self, browser):
+        self.browser = browser
+
+    @property
+    def title(self):
+        return self.browser.title
+
+    @property
+    def url(self):
+        return self.browser.current_url
+
+    @property
+    def source(self):
+        return self.browser.page_source
+
+    def get(self, url):
+        self.browser.get(url)
+
+    def execute(self, script, *args):
+        return self.browser.execute_script(script, *args)
+
+    def texts(self, selector):
+        return self.browser.execute_script(_TEXTS_JS, None, selector)
+
+    def fingerprint(self, selector="body"):
+        return self.browser.execute_script(_FINGERPRINT_JS, selector)
+
+    def read_fields(self, fields):
+        return self.browser.execute_script(_READ_FIELDS_JS,
+                                           [list(f) for f in fields])
+
+    def write_fields(self, fields):
+        for kind, locator, value in fields:
+            if kind not in (INPUT, SELECT, RADIO, CHECKBOX):
+                raise ValueError("Field kind %s cannot be written" % kind)
+        return self.browser.execute_script(_WRITE_FIELDS_JS,
+                                           [list(f) for f in fields])
+
+    def find(self, by, value):
+        return _selenium_find(self.browser, by, value)
+
+    def find_all(self, by, value):
+        return [SeleniumElement(e)
+                for e in self.browser.find_elements(by, value)]
+
+class SeleniumElement(Element):
+    """
+    An element backed by a WebElement.
+    """
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def text(self):
+        return self.element.text
+
+    @property
+    def tag_name(self):
+        return self.element.tag_name
+
+    def get_attribute(self, name):
+        return self.element.get_attribute(name)
+
+    def is_selected(self):
+        return self.element.is_selected()
+
+    def is_displayed(self):
+        return self.element.is_displayed()
+
+    def click(self):
+        self.element.click()
+
+    def clear(self):
+        self.element.clear()
+
+    def send_keys(self, *value):
+        self.element.send_keys(*value)
+
+    def texts(self, selector):
+        return self.element.parent.execute_script(_TEXTS_JS, self.element,
+                                                  selector)
+
+    def find(self, by, value):
+        return _selenium_find(self.element, by, value)
+
+    def find_all(self, by, value):
+        return [SeleniumElement(e)
+                for e in self.element.find_elements(by, value)]
+
+_selenium_errors = {}
+
+def _selenium_error(error):
+    """
+    Return a copy of the Selenium NoSuchElementException `error` that is also
+    a :class:`NoSuchElementException`.
+    """
+    cls = type(error)
+    if cls not in _selenium_errors:
+        _selenium_errors[cls] = type(cls.__name__,
+                                     (NoSuchElementException, cls), {})
+    return _selenium_errors[cls](error.msg, error.screen, error.stacktrace)
+
+def _selenium_find(parent, by, value):
+    try:
+        return SeleniumElement(parent.find_element(by, value))
+    except NoSuchElementException:
+        # already ours, e.g. from a stand-in driver
+        raise
+    except Exception as e:
+        # a browser that raised Selenium's exception has loaded Selenium, so
+        # there is no need to import it here
+        exceptions = sys.modules.get("selenium.common.exceptions")
+        missing = getattr(exceptions, "NoSuchElementException", None)
+        if missing is None or not isinstance(e, missing):
+            raise
+        raise _selenium_error(e), None, sys.exc_info()[2]
+
+class StaticDocument(Document):
+    """
+    A document parsed from HTML. Navigation is ignored and scripts cannot be
+    run. Typing and clicking on form controls update the parsed document, so
+    page objects can also fill in forms against it.
+    """
+    def __init__(self, source, title=None, url=None):
+        import lxml.html
+        self.source = source
+        self.root = lxml.html.document_fromstring(source)
+        if title is None:
+            title = self.root.findtext(".//title") or ""
+        self.title = title.strip()
+        self.url = url
+
+    @classmethod
+    def from_file(cls, path, url=None):
+        """
+        Parse the HTML file at `path`.
+        """
+        with open(path, "rb") as f:
+            return cls(f.read().decode("utf-8"), url=url)
+
+    def get(self, url):
+        pass
+
+    def execute(self, script, *args):
+        raise NotImplementedError("Scripts cannot be run on a static page.")
+
+    def snapshot(self):
+        return self
+
+    def fingerprint(self, selector="body"):
+        # form values are stored in the tree, so serializing it covers them
+        from lxml import etree
+        matches = self.css_all(selector)
+        root = matches[0].element if matches else self.root
+        return hashlib.sha1(self.title.encode("utf-8") + b"\0" +
+                            etree.tostring(root)).hexdigest()
+
+    def find_all(self, by, value):
+        return _find_all(self.root, by, value)
+
+class StaticElement(Element):
+    """
+    An element of a :class:`StaticDocument`, backed by an lxml element.
+    """
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def tag_name(self):
+        return self.element.tag
+
+    @property
+    def text(self):
+        if not self.is_displayed():
+            return ""
+        lines = self.element.text_content().splitlines()
+        lines = [" ".join(line.split()) for line in lines]
+        return "\n".join(line for line in lines if line)
+
+    def get_attribute(self, name):
+        element = self.element
+        if name == "value" and element.tag == "textarea":
+            return element.text_content()
+        if name == "value" and element.tag == "select":
+            options = element.xpath(".//option[@selected]")
+            return options[0].get("value") if options else None
+        return element.get(name)
+
+    def is_selected(self):
+        return self.element.get("checked") is not None or \
+               self.element.get("selected") is not None
+
+    def is_displayed(self):
+        element = self.element
+        while element is not None:
+            style = (element.get("style") or "").replace(" ", "").lower()
+            if element.get("hidden") is not None or "display:none" in style \
+               or element.get("type") == "hidden":
+                return False
+            element = element.getparent()
+        return True
+
+    def click(self):
+        element = self.element
+        if element.tag == "option":
+            for option in element.getparent().iterchildren("option"):
+                option.attrib.pop("selected", None)
+            element.set("selected", "selected")
+        elif element.get("type") == "checkbox":
+            if element.get("checked") is None:
+                element.set("checked", "checked")
+            else:
+                del element.attrib["checked"]
+        elif element.get("type") == "radio":
+            group = "//input[@type='radio'][@name='%s']" % element.get("name")
+            for radio in element.xpath(group):
+                radio.attrib.pop("checked", None)
+            element.set("checked", "checked")
+
+    def clear(self):
+        if self.element.tag == "textarea":
+            self.element.text = ""
+        else:
+            self.element.set("value", "")
+
+    def send_keys(self, *value):
+        typed = "".join(value)
+        if self.element.tag == "textarea":
+            self.element.text = (self.element.text or "") + typed
+        else:
+            self.element.set("value", (self.element.get("value") or "") + typed)
+
+    def find_all(self, by, value):
+        return _find_all(self.element, by, value)
+
+_compiled = {}
+
+def _find_all(root, by, value):
+    """
+    Evaluate a locator against an lxml element and wrap the resulting elements.
+    Compiled locators are cached, since page objects reuse a small set.
+    """
+    xpath = _compiled.get((by, value))
+    if xpath is None:
+        from lxml import etree
+        if by == CSS:
+            from cssselect import HTMLTranslator
+            expr = HTMLTranslator().css_to_xpath(value, prefix="descendant::")
+        elif by == XPATH:
+            expr = value
+        else:
+            raise ValueError("Unsupported locator: %s" % by)
+        if len(_compiled) > 1000:
+            _compiled.clear()
+        xpath = _compiled[(by, value)] = etree.XPath(expr)
+    return [StaticElement(e) for e in xpath(root)
+            if not isinstance(e, basestring)]
@@ -0,0 +1,138 @@
+"""
+    history
+    ~~~~~~~
+
+    The `history` module turns the 'RFP History' section of an RFP, as
+    returned by :meth:`rfp.ViewOnlyPage.history` or :func:`rfp.view`, into
+    typed events, and derives approval-latency metrics from them::
+
+        events = history.parse_history(rfp.view(browser, "123")["history"])
+        history.inbox_durations(events)
+        history.cycle_time_stats([events, ...])
+"""
+
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%d-%b-%Y")
+TIME_FORMATS = ("%I:%M %p", "%I:%M:%S %p", "%H:%M:%S", "%H:%M")
+
+_ACTOR = re.compile(r"\s+by\s+(.+?)\s*$", re.IGNORECASE)
+_INBOX = re.compile(r"(?:sent to|inbox of)\s+(?:(?:the\s+)?inbox of\s+)?"
+                    r"(.+?)(?:\s+by\s+.*)?$", re.IGNORECASE)
+_TERMINAL = re.compile(r"\b(posted|deleted)\b", re.IGNORECASE)
+
+class HistoryEvent(namedtuple("HistoryEvent", "timestamp actor action inbox")):
+    """
+    One row of an RFP's history. `timestamp` is a datetime, or None if the
+    date could not be parsed. `actor` is the person named as having taken the
+    action, if any. `inbox` is the inbox the RFP moved to, if the action sent
+    it somewhere. `action` is the original text.
+    """
+    __slots__ = ()
+
+def parse_history(rows):
+    """
+    Convert (date, time, action) tuples into a list of :class:`HistoryEvent`,
+    sorted oldest first.
+    """
+    events = [parse_event(date, time, action) for date, time, action in rows]
+    return sorted(events, key=lambda e: e.timestamp or datetime.min)
+
+def parse_event(date, time, action):
+    """
+    Convert a single (date, time, action) row into a :class:`HistoryEvent`.
+    """
+    actor = _ACTOR.search(action)
+    inbox = _INBOX.search(action)
+    return HistoryEvent(_parse_timestamp(date.strip(), time.strip()),
+                        actor.group(1) if actor else None,
+                        action,
+                        inbox.group(1) if inbox else None)
+
+def _parse_timestamp(date, time):
+    for date_format in DATE_FORMATS:
+        for time_format in TIME_FORMATS:
+            try:
+                return datetime.strptime("%s %s" % (date, time),
+                                         "%s %s" % (date_format, time_format))
+            except ValueError:
+                pass
+        try:
+            return datetime.strptime(date, date_format)
+        except ValueError:
+            pass
+    return None
+
+def cycle_time(events):
+    """
+    Return the time between the first and last events as a timedelta, or None
+    if fewer than two events have timestamps.
+    """
+    stamps = [e.timestamp for e in events if e.timestamp is not None]
+    if len(stamps) < 2:
+        return None
+    return max(stamps) - min(stamps)
+
+def inbox_durations(events, now=None):
+    """
+    Return a dictionary mapping each inbox to the total time the RFP spent in
+    it, as a timedelta. An RFP is in an inbox from the event that sent it
+    there until the next event that sent it elsewhere, or until it was posted
+    or deleted. Time in the current inbox is counted up to `now`, if given.
+    """
+    durations = {}
+    current = since = None
+    for event in events:
+        terminal = _TERMINAL.search(event.action)
+        if event.timestamp is None or (event.inbox is None and not terminal):
+            continue
+        if current is not None:
+            durations[current] = durations.get(current, timedelta()) + \
+                                 (event.timestamp - since)
+        current, since = event.inbox, event.timestamp
+    if current is not None and now is not None:
+        durations[current] = durations.get(current, timedelta()) + \
+                             (now - since)
+    return durations
+
+def cycle_time_stats(histories):
+    """
+    Summarize the cycle times of many RFPs. `histories` is an iterable of
+    event lists. Return a dictionary with the keys count, mean, median, p90,
+    min and max; times are timedeltas, or None if there are no cycle times.
+    """
+    return _stats([cycle_time(events) for events in histories])
+
+def inbox_latency_stats(histories, now=None):
+    """
+    Summarize the time spent in each inbox across many RFPs. Return a
+    dictionary mapping each inbox to statistics as in
+    :func:`cycle_time_stats`.
+    """
+    samples = {}
+    for events in histories:
+        for inbox, duration in inbox_durations(events, now).items():
+            samples.setdefault(inbox, []).append(duration)
+    return dict((inbox, _stats(durations))
+                for inbox, durations in samples.items())
+
+def _stats(durations):
+    seconds = sorted(_seconds(d) for d in durations if d is not None)
+    result = {"count": len(seconds)}
+    if not seconds:
+        result.update(dict.fromkeys(("mean", "median", "p90", "min", "max")))
+        return result
+    def at(fraction):
+        return timedelta(seconds=seconds[int(fraction * (len(seconds) - 1))])
+    result["mean"] = timedelta(seconds=sum(seconds) / len(seconds))
+    result["median"] = at(0.5)
+    result["p90"] = at(0.9)
+    result["min"] = timedelta(seconds=seconds[0])
+    result["max"] = timedelta(seconds=seconds[-1])
+    return result
+
+def _seconds(duration):
+    return duration.days * 86400.0 + duration.seconds + \
+           duration.microseconds / 1e6
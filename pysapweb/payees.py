@@ -0,0 +1,255 @@
+"""
+    payees
+    ~~~~~~
+
+    The `payees` module picks the right payee among the results of a payee
+    search, so that a common name does not make :func:`rfp.create` fail::
+
+        directory = payees.PayeeDirectory("payees.json")
+        rfp.create(browser, payee=(True, "tbeaver"), ..., payees=directory)
+
+    Results shown by :meth:`rfp.SearchForPayeePage.results` have the form
+    "Name (kerberos,department)". A :class:`PayeeDirectory` remembers every
+    result it has seen, indexed by kerberos, name and department, so a payee
+    can later be given by kerberos name alone and the search sent to SAPweb
+    can be made more or less specific as needed.
+"""
+
+import difflib
+import json
+import os
+import re
+from collections import namedtuple
+
+_RESULT = re.compile(r"^\s*(.*?)\s*\(\s*([^,()]*?)\s*,\s*([^()]*?)\s*\)\s*$")
+_KERBEROS = re.compile(r"^[a-z0-9_]{3,8}$")
+
+#: Similarity (0 to 1) a fuzzy name match must reach.
+CUTOFF = 0.8
+
+class Payee(namedtuple("Payee", "name kerberos department")):
+    """
+    A parsed payee search result.
+    """
+    __slots__ = ()
+
+def parse_result(text):
+    """
+    Parse a result such as 'Tim D. Beaver (tbeaver,Mechanical Engineering)'
+    into a :class:`Payee`. Return None for other entries, such as 'No
+    results found: Continue'.
+    """
+    match = _RESULT.match(text)
+    if match is None:
+        return None
+    return Payee(*match.groups())
+
+def normalize_name(name):
+    """
+    Reduce a name to lowercase words in sorted order, so that 'Beaver, Tim'
+    and 'Tim Beaver' compare equal.
+    """
+    return " ".join(sorted(re.findall(r"\w+", name.lower(), re.UNICODE)))
+
+class PayeeDirectory(object):
+    """
+    An index of payees seen in search results. If `path` is given, the
+    directory is loaded from that file if it exists, and saved to it by
+    :meth:`save`.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.by_kerberos = {}
+        self.by_name = {}
+        self.by_department = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                for payee in json.load(f):
+                    self.add(Payee(*payee))
+
+    def __len__(self):
+        return len(self.by_kerberos)
+
+    def add(self, payee):
+        """
+        Add a :class:`Payee`, replacing any with the same kerberos name.
+        """
+        old = self.by_kerberos.get(payee.kerberos.lower())
+        if old == payee:
+            return
+        if old is not None:
+            self.by_name[normalize_name(old.name)].remove(old)
+            self.by_department[old.department.lower()].remove(old)
+        self.by_kerberos[payee.kerberos.lower()] = payee
+        self.by_name.setdefault(normalize_name(payee.name), []).append(payee)
+        self.by_department.setdefault(payee.department.lower(),
+                                      []).append(payee)
+
+    def add_results(self, results):
+        """
+        Parse and add the payees in a list of search results.
+        """
+        for text in results:
+            payee = parse_result(text)
+            if payee is not None and payee.kerberos:
+                self.add(payee)
+
+    def lookup(self, query, department=None, fuzzy=True):
+        """
+        Return the payees matching `query`: the payee with that kerberos
+        name, or else those with that name, or else (if `fuzzy`) those with
+        similar names, best match first. If `department` is given, only
+        payees in departments containing it are returned.
+        """
+        payee = parse_result(query)
+        if payee is not None:
+            query, department = payee.kerberos or payee.name, \
+                                department or payee.department
+        if query.lower() in self.by_kerberos:
+            found = [self.by_kerberos[query.lower()]]
+        else:
+            key = normalize_name(query)
+            found = list(self.by_name.get(key, ()))
+            if not found and fuzzy:
+                for name in difflib.get_close_matches(key, self.by_name,
+                                                      n=5, cutoff=CUTOFF):
+                    found.extend(self.by_name[name])
+        if department:
+            found = [p for p in found
+                     if department.lower() in p.department.lower()]
+        return found
+
+    def search_terms(self, query):
+        """
+        Return the payee names to search SAPweb for, in order, to find
+        `query`: the full name of the payee it identifies, if known; the name
+        given; then only its last word, to widen a search that found
+        nothing.
+        """
+        terms = []
+        known = self.lookup(query, fuzzy=False)
+        if len(known) == 1:
+            terms.append(known[0].name)
+        terms.extend(_search_terms(query))
+        return _unique(terms)
+
+    def save(self):
+        """
+        Write the directory to `path`, if set, replacing the file atomically.
+        """
+        if self.path is None:
+            return
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(sorted(self.by_kerberos.values()), f)
+        os.rename(temp, self.path)
+
+def search_terms(query, directory=None):
+    """
+    Return the payee names to search for to find `query`, as in
+    :meth:`PayeeDirectory.search_terms`.
+    """
+    if directory is not None:
+        return directory.search_terms(query)
+    return _unique(_search_terms(query))
+
+def _search_terms(query):
+    payee = parse_result(query)
+    name = payee.name if payee is not None else query.strip()
+    words = name.replace(",", " ").split()
+    terms = [name]
+    if len(words) > 1:
+        # "Beaver, Tim" is listed by last name first
+        terms.append(words[0] if "," in name else words[-1])
+    return terms
+
+def _unique(items):
+    seen = set()
+    return [i for i in items if not (i in seen or seen.add(i))]
+
+def choose(results, query, directory=None, single=True, fuzzy=False):
+    """
+    Return the index of the search result that `query` identifies, or None
+    if no result or more than one fits. `query` may be a kerberos name, a
+    name, or a full result string; `directory`, if given, supplies the
+    kerberos name of payees given by name. If `single` is True, a lone
+    result is taken to be the payee without checking it.
+
+    A single lowercase word is only taken for a kerberos name before trying
+    names if the directory knows it; otherwise names are tried first. Only
+    if `fuzzy` is True is a result with a clearly closest similar name
+    chosen when nothing matches exactly; see :func:`rank` for listing
+    candidates instead.
+    """
+    if single and len(results) == 1:
+        return 0
+    parsed = [parse_result(text) for text in results]
+    payee = parse_result(query)
+    name = payee.name if payee is not None else query.strip()
+    department = payee.department if payee is not None else None
+    kerberos = set()
+    guessed = set()
+    if payee is not None and payee.kerberos:
+        kerberos.add(payee.kerberos.lower())
+    elif _KERBEROS.match(query.strip()):
+        if directory is not None and query.strip() in directory.by_kerberos:
+            kerberos.add(query.strip())
+        else:
+            guessed.add(query.strip())
+    if directory is not None and not kerberos:
+        known = directory.lookup(query, fuzzy=False)
+        if len(known) == 1:
+            kerberos.add(known[0].kerberos.lower())
+
+    def only(indices):
+        return indices[0] if len(indices) == 1 else None
+
+    def by_kerberos(names):
+        return only([i for i, p in enumerate(parsed)
+                     if p is not None and p.kerberos.lower() in names])
+
+    # by known kerberos name
+    index = by_kerberos(kerberos)
+    if index is not None:
+        return index
+    # by name, then name and department
+    key = normalize_name(name)
+    same = [i for i, p in enumerate(parsed)
+            if p is not None and normalize_name(p.name) == key]
+    if department and len(same) > 1:
+        same = [i for i in same
+                if department.lower() in parsed[i].department.lower()]
+    if same:
+        return only(same)
+    # by what may be a kerberos name
+    index = by_kerberos(guessed)
+    if index is not None or not fuzzy:
+        return index
+    # by similar name, if one is clearly closest
+    scores = _scores(parsed, key)
+    if scores and scores[0][0] >= CUTOFF and \
+       (len(scores) == 1 or scores[0][0] - scores[1][0] >= 0.1):
+        return scores[0][1]
+    return None
+
+def rank(results, query):
+    """
+    Return the indices of the payee search results whose names are similar
+    to `query` (see :data:`CUTOFF`), most similar first, e.g. to list the
+    candidates when :func:`choose` finds no single payee.
+    """
+    payee = parse_result(query)
+    name = payee.name if payee is not None else query.strip()
+    scores = _scores([parse_result(text) for text in results],
+                     normalize_name(name))
+    return [i for score, i in scores if score >= CUTOFF]
+
+def _scores(parsed, key):
+    """
+    Return (similarity, index) pairs for the parsed results, by similarity
+    of their names to the normalized name `key`, highest first.
+    """
+    return sorted(((difflib.SequenceMatcher(None, key,
+                                            normalize_name(p.name)).ratio(),
+                    i) for i, p in enumerate(parsed) if p is not None),
+                  key=lambda score: (-score[0], score[1]))
@@ -0,0 +1,98 @@
+"""
+    pool
+    ~~~~
+
+    The `pool` module shares a bounded number of browsers between threads.
+    Browsers are started on demand and reused::
+
+        pool = BrowserPool(sap_profiles.load_firefox, size=4)
+        with pool.browser() as browser:
+            rfp.view(browser, "123")
+"""
+
+import threading
+from contextlib import contextmanager
+
+class BrowserPool(object):
+    """
+    Up to `size` browsers, each created by calling `factory()` the first time
+    it is needed. A browser is used by one thread at a time.
+
+    If `retire` is given, it is called with each browser as it is released;
+    if it returns True, the browser is quit and a fresh one is started when
+    next needed (see :func:`watchdog.retire`).
+    """
+    def __init__(self, factory, size=1, retire=None):
+        self.factory = factory
+        self.size = size
+        self.retire = retire
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Take a browser from the pool, starting one if the pool is not yet
+        full, or else waiting for one to be released.
+        """
+        with self._condition:
+            while not self._idle and self._created >= self.size:
+                if self._closed:
+                    raise RuntimeError("The pool is closed.")
+                self._condition.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self.factory()
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, browser, discard=False):
+        """
+        Return a browser to the pool. If `discard` is True, quit it instead,
+        so that a fresh one is started when next needed.
+        """
+        if not discard and self.retire is not None:
+            discard = self.retire(browser)
+        with self._condition:
+            if discard or self._closed:
+                self._created -= 1
+            else:
+                self._idle.append(browser)
+            self._condition.notify()
+        if discard or self._closed:
+            _quit(browser)
+
+    @contextmanager
+    def browser(self):
+        """
+        Acquire a browser for the duration of a `with` block.
+        """
+        browser = self.acquire()
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def close(self):
+        """
+        Quit every idle browser. Browsers in use are quit when released.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._condition.notify_all()
+        for browser in idle:
+            _quit(browser)
+
+def _quit(browser):
+    try:
+        browser.quit()
+    except Exception:
+        pass
@@ -0,0 +1,107 @@
+"""
+    prefetch
+    ~~~~~~~~
+
+    The `prefetch` module overlaps SAPweb's latency with the caller's own
+    work. :func:`view_search` runs a search, then yields the details of each
+    result, in order, while the next few are already being loaded on other
+    browsers of a :class:`pool.BrowserPool`::
+
+        pool = BrowserPool(sap_profiles.load_firefox, size=3)
+        for details in prefetch.view_search(pool, lookahead=4,
+                                            cost_object="6666666"):
+            process(details)
+
+    At most `lookahead` results are loaded ahead of the caller, so memory
+    stays bounded however many RFPs are found, and at most `size` are loaded
+    at once. Each look-ahead uses its own browser rather than another tab:
+    a WebDriver session runs one command at a time, so tabs of one session
+    would not load in parallel.
+"""
+
+import sys
+import threading
+from collections import deque
+
+from pysapweb import rfp, tracing
+
+class _Fetch(object):
+    """
+    A call of `func` on a browser from the pool, running in its own thread.
+    """
+    def __init__(self, pool, func, item):
+        self.item = item
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, args=(pool, func))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, pool, func):
+        try:
+            with pool.browser() as browser:
+                with tracing.span("prefetch", item=self.item):
+                    self._result = func(browser, self.item)
+        except Exception:
+            self._error = sys.exc_info()
+
+    def result(self):
+        """
+        Wait for the call to finish and return its value, or raise the
+        exception it raised.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+        return self._result
+
+def prefetch(pool, func, items, lookahead=4, on_error=None):
+    """
+    Yield `func(browser, item)` for each of `items`, in order, with a browser
+    from `pool`, calling it for up to `lookahead` items ahead of the one
+    being yielded.
+
+    If a call raises an exception, the exception is raised in turn, after
+    the calls already started have finished. If `on_error` is given, it is
+    instead called with the item and the exception, and the item is
+    skipped.
+    """
+    items = iter(items)
+    window = deque()
+    try:
+        for item in items:
+            window.append(_Fetch(pool, func, item))
+            if len(window) > lookahead:
+                for result in _next(window, on_error):
+                    yield result
+        while window:
+            for result in _next(window, on_error):
+                yield result
+    finally:
+        # let abandoned calls finish, so their browsers go back to the pool
+        for fetch in window:
+            fetch._thread.join()
+
+def _next(window, on_error):
+    fetch = window.popleft()
+    try:
+        result = fetch.result()
+    except Exception as e:
+        if on_error is None:
+            raise
+        on_error(fetch.item, e)
+        return []
+    return [result]
+
+def view_search(pool, lookahead=4, on_error=None, **criteria):
+    """
+    Search for RFPs as :func:`rfp.search` does, then yield the details of
+    each one found, as returned by :func:`rfp.view`, in the order found.
+    Details are loaded up to `lookahead` RFPs ahead, as in :func:`prefetch`.
+    """
+    with pool.browser() as browser:
+        results = rfp.search(browser, **criteria)
+    numbers = [rfp.normalize_rfp_number(result["rfp_number"])
+               for result in results]
+    for details in prefetch(pool, rfp.view, numbers, lookahead, on_error):
+        yield details
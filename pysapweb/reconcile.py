@@ -0,0 +1,153 @@
+"""
+    reconcile
+    ~~~~~~~~~
+
+    The `reconcile` module matches a local ledger of expected reimbursements
+    against the RFPs found in SAPweb::
+
+        sapweb = reconcile.search_results(browser, cost_object="6666666")
+        ledger = reconcile.CsvLedger("ledger.csv")
+        for row in reconcile.reconcile(ledger, sapweb, browser=browser):
+            print row.status, row.rfp_number
+
+    Both sides are keyed by normalized RFP number and compared in integer
+    cents. The join is done in `partitions` passes, each holding only a
+    fraction of the ledger in memory, so large ledgers can be reconciled in
+    bounded memory.
+"""
+
+import csv
+import json
+import sqlite3
+import tempfile
+import zlib
+from collections import namedtuple
+
+from pysapweb import rfp
+from pysapweb.amounts import parse_cents
+
+MATCHED = "matched"
+MISSING = "missing"
+EXTRA = "extra"
+MISMATCHED = "mismatched"
+
+class Row(namedtuple("Row", "status rfp_number ledger_cents sapweb_cents")):
+    """
+    One reconciled RFP. `status` is one of MATCHED, MISSING (in the ledger but
+    not in SAPweb), EXTRA (in SAPweb but not in the ledger) or MISMATCHED.
+    Amounts are integer cents, or None on the side where the RFP is absent.
+    """
+    __slots__ = ()
+
+def search_results(browser, cost_object=None, start=None, end=None):
+    """
+    Search SAPweb for parked and posted RFPs, optionally limited to a cost
+    object and a range of creation dates, and return the results as a list of
+    (rfp_number, cents) tuples with normalized RFP numbers.
+    """
+    page = rfp.SearchPage(browser)
+    page.rfp_types(parked=True, posted=True)
+    if cost_object:
+        page.cost_object(cost_object)
+    if start:
+        page.creation_start(start)
+    if end:
+        page.creation_end(end)
+    try:
+        page = page.search()
+    except rfp.FailedTransitionError:
+        # SAPweb reports a search with no results as an error
+        return []
+    if isinstance(page, rfp.ViewOnlyPage):
+        # a single result is displayed directly
+        total = sum(parse_cents(page.amount(i)) or 0
+                    for i in range(page.line_item_count()))
+        return [(rfp.normalize_rfp_number(page.rfp_number()), total)]
+    return [(rfp.normalize_rfp_number(row["rfp_number"]),
+             parse_cents(row["amount"]))
+            for row in page.result_table()]
+
+class CsvLedger(object):
+    """
+    A ledger stored as a CSV file with a header row. Iterating yields
+    (rfp_number, cents) tuples, reading the file from the start each time.
+    """
+    def __init__(self, path, number_column="rfp_number",
+                 amount_column="amount"):
+        self.path = path
+        self.number_column = number_column
+        self.amount_column = amount_column
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for row in csv.DictReader(f):
+                yield (rfp.normalize_rfp_number(row[self.number_column]),
+                       parse_cents(row[self.amount_column]))
+
+class SqliteLedger(object):
+    """
+    A ledger stored in an SQLite database. `query` must select the RFP number
+    and the amount, in that order; amounts may be text or numbers of dollars.
+    Iterating yields (rfp_number, cents) tuples, streaming from the cursor.
+    """
+    def __init__(self, path, query="SELECT rfp_number, amount FROM ledger"):
+        self.path = path
+        self.query = query
+
+    def __iter__(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            for number, amount in connection.execute(self.query):
+                yield (rfp.normalize_rfp_number("%s" % (number,)),
+                       parse_cents(amount))
+        finally:
+            connection.close()
+
+def reconcile(ledger, sapweb, partitions=1, browser=None):
+    """
+    Match `ledger` against `sapweb`, both iterables of (rfp_number, cents),
+    and yield a :class:`Row` for every RFP number on either side. Ledger rows
+    with the same RFP number are summed.
+
+    `ledger` must be re-iterable if `partitions` is more than one; `sapweb`
+    is read once and spilled to a temporary file. If `browser` is given,
+    RFPs whose amounts disagree or whose search amount could not be parsed
+    are looked up with :func:`rfp.view`, and matched against the sum of their
+    line items instead.
+    """
+    spill = tempfile.TemporaryFile()
+    try:
+        for number, cents in sapweb:
+            spill.write(json.dumps([number, cents]) + "\n")
+        for partition in range(partitions):
+            expected = {}
+            for number, cents in ledger:
+                if _partition(number, partitions) == partition:
+                    expected[number] = expected.get(number, 0) + (cents or 0)
+            spill.seek(0)
+            for line in spill:
+                number, cents = json.loads(line)
+                if _partition(number, partitions) != partition:
+                    continue
+                if number not in expected:
+                    yield Row(EXTRA, number, None, cents)
+                    continue
+                ledger_cents = expected.pop(number)
+                if cents != ledger_cents and browser is not None:
+                    cents = _view_total(browser, number)
+                status = MATCHED if cents == ledger_cents else MISMATCHED
+                yield Row(status, number, ledger_cents, cents)
+            for number, ledger_cents in expected.items():
+                yield Row(MISSING, number, ledger_cents, None)
+    finally:
+        spill.close()
+
+def _partition(rfp_number, partitions):
+    return zlib.crc32(rfp_number.encode("utf-8")) % partitions
+
+def _view_total(browser, rfp_number):
+    """
+    Return the sum of an RFP's line items, in cents.
+    """
+    details = rfp.view(browser, rfp_number)
+    return sum(parse_cents(li["amount"]) or 0 for li in details["line_items"])
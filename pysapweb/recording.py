@@ -0,0 +1,236 @@
+"""
+    recording
+    ~~~~~~~~~
+
+    The `recording` module captures SAPweb sessions as HTML fixtures and plays
+    them back without a network connection. Wrap a live browser in a
+    :class:`RecordingBrowser`, run scripts as usual, and save the resulting
+    :class:`Archive`. A :class:`ReplayBrowser` later serves the captured pages
+    to the `rfp` page objects in the same order, through the `dom` interface.
+
+    Scripts that page objects run through :meth:`dom.Document.execute`, such
+    as those of :meth:`rfp.RequestRfpPage.set_line_items` and
+    :meth:`rfp.InboxPage.delete_many`, are recorded too, with their result
+    and the page they leave behind, and are replayed in the same order. A
+    script that returns elements of the page cannot be replayed.
+
+    Replay requires `lxml` and `cssselect`, installed with the `static`
+    extra.
+"""
+
+import hashlib
+import json
+import zipfile
+
+from pysapweb import dom
+
+class Archive(object):
+    """
+    An ordered list of captures, one per page transition. Each capture holds
+    the label of the action that caused it (e.g. 'SearchPage.search'), the
+    page title, the URL and the page source. Identical page sources are stored
+    only once. `scripts` lists the scripts run in the page, in order, each
+    with the index of the capture it was run on, its result and the page
+    source it left.
+    """
+    MANIFEST = "captures.json"
+    SCRIPTS = "scripts.json"
+
+    def __init__(self):
+        self.captures = []
+        self.scripts = []
+        self.sources = {}
+
+    def __len__(self):
+        return len(self.captures)
+
+    def add(self, label, title, url, source):
+        """
+        Append a capture to the archive.
+        """
+        self.captures.append({"label": label, "title": title, "url": url,
+                              "source": self._store(source)})
+
+    def add_script(self, script, result, source):
+        """
+        Append the result of a script run on the latest capture, and the page
+        source after it. A result that cannot be stored as JSON is recorded
+        as not replayable.
+        """
+        try:
+            json.dumps(result)
+        except (TypeError, ValueError):
+            result, replayable = None, False
+        else:
+            replayable = True
+        self.scripts.append({"script": _digest(script),
+                             "capture": len(self.captures) - 1,
+                             "result": result, "replayable": replayable,
+                             "source": self._store(source)})
+
+    def _store(self, source):
+        digest = _digest(source)
+        self.sources.setdefault(digest, source)
+        return digest
+
+    def capture(self, index):
+        """
+        Return the capture at the given index as a tuple of
+        (label, title, url, source).
+        """
+        capture = self.captures[index]
+        return (capture["label"], capture["title"], capture["url"],
+                self.sources[capture["source"]])
+
+    def save(self, path):
+        """
+        Write the archive to a compressed zip file.
+        """
+        archive = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        try:
+            archive.writestr(self.MANIFEST, json.dumps(self.captures))
+            archive.writestr(self.SCRIPTS, json.dumps(self.scripts))
+            for digest, source in self.sources.items():
+                archive.writestr("pages/%s.html" % digest,
+                                 source.encode("utf-8"))
+        finally:
+            archive.close()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an archive written by :meth:`save`.
+        """
+        result = cls()
+        archive = zipfile.ZipFile(path, "r")
+        try:
+            result.captures = json.loads(archive.read(cls.MANIFEST))
+            if cls.SCRIPTS in archive.namelist():
+                result.scripts = json.loads(archive.read(cls.SCRIPTS))
+            for capture in result.captures + result.scripts:
+                digest = capture["source"]
+                if digest not in result.sources:
+                    data = archive.read("pages/%s.html" % digest)
+                    result.sources[digest] = data.decode("utf-8")
+        finally:
+            archive.close()
+        return result
+
+class RecordingBrowser(object):
+    """
+    Wraps a WebDriver instance, adding a capture to `archive` each time a page
+    object reports a transition, and recording the scripts page objects run.
+    Everything else is passed through to the wrapped browser, so the recorder
+    can be used wherever a WebDriver is expected.
+    """
+    def __init__(self, browser, archive=None):
+        self.browser = browser
+        self.archive = Archive() if archive is None else archive
+        self._local = dom._local_scripts()
+
+    def __getattr__(self, name):
+        return getattr(self.browser, name)
+
+    def execute_script(self, script, *args):
+        """
+        Run a script in the browser, recording its result and the page it
+        leaves. Scripts that replay evaluates itself are not recorded.
+        """
+        result = self.browser.execute_script(script, *args)
+        if script not in self._local:
+            self.archive.add_script(script, result, self.browser.page_source)
+        return result
+
+    def checkpoint(self, label):
+        """
+        Capture the current page. Called by the `rfp` page objects.
+        """
+        self.archive.add(label, self.browser.title, self.browser.current_url,
+                         self.browser.page_source)
+
+class ReplayBrowser(dom.Document):
+    """
+    A document that serves the pages in an :class:`Archive`. Each transition
+    reported by a page object advances to the next capture recorded with the
+    same label, which is then read as a :class:`dom.StaticDocument`. Typing
+    and clicking on form controls update the captured page until the next
+    transition; other clicks have no effect. A script returns its recorded
+    result and replaces the page with the one it left.
+    """
+    def __init__(self, archive):
+        self.archive = archive
+        self.position = -1
+        self.script_position = -1
+        self.page = None
+
+    def checkpoint(self, label):
+        """
+        Advance to the next capture made for `label`. Raise
+        :class:`ReplayError` if there is none.
+        """
+        for index in range(self.position + 1, len(self.archive)):
+            if self.archive.captures[index]["label"] == label:
+                label, title, url, source = self.archive.capture(index)
+                self.position = index
+                self.page = dom.StaticDocument(source, title, url)
+                return
+        raise ReplayError("No capture left for %s." % label)
+
+    def _current(self):
+        if self.page is None:
+            raise ReplayError("No page has been loaded yet.")
+        return self.page
+
+    @property
+    def title(self):
+        return self._current().title
+
+    @property
+    def url(self):
+        return self._current().url
+
+    @property
+    def source(self):
+        return self._current().source
+
+    def get(self, url):
+        """
+        Navigation is replayed by the checkpoint that follows it.
+        """
+        pass
+
+    def execute(self, script, *args):
+        """
+        Return the recorded result of the next run of `script` on the
+        current capture, and load the page it left. Raise
+        :class:`ReplayError` if there is none.
+        """
+        digest = _digest(script)
+        page = self._current()
+        for index in range(self.script_position + 1,
+                           len(self.archive.scripts)):
+            entry = self.archive.scripts[index]
+            if entry["script"] == digest and entry["capture"] == self.position:
+                if not entry["replayable"]:
+                    raise ReplayError("The script's result was not recorded.")
+                self.script_position = index
+                self.page = dom.StaticDocument(
+                    self.archive.sources[entry["source"]], page.title,
+                    page.url)
+                return entry["result"]
+        raise ReplayError("No recorded run left for a script.")
+
+    def fingerprint(self, selector="body"):
+        return self._current().fingerprint(selector)
+
+    def find_all(self, by, value):
+        return self._current().find_all(by, value)
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class ReplayError(Exception):
+    """
+    The replayed session diverged from the recorded one.
+    """
+    pass
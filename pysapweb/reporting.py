@@ -0,0 +1,215 @@
+"""
+    reporting
+    ~~~~~~~~~
+
+    The `reporting` module totals RFP line items in bulk. Line items, such as
+    those returned by :func:`rfp.view`, are stored as NumPy columns with
+    amounts in exact integer cents, and summed by any combination of cost
+    object, G/L account and month::
+
+        items = reporting.LineItems.from_details(rfp.view(browser, n)
+                                                 for n in rfp_numbers)
+        for (cost_object, month), cents in items.group_sum(
+                ("cost_object", "month")).items():
+            print cost_object, month, amounts.format_cents(cents)
+
+    Parsing and grouping are done with array operations, so a year of line
+    items is handled without a Python loop per row. NumPy is required only
+    by this module.
+"""
+
+from pysapweb import rfp
+from pysapweb.amounts import parse_cents
+
+#: Most digits before the decimal point that are parsed with array
+#: operations. Longer amounts would overflow the int64 sum of their digits, so
+#: they are parsed one at a time instead.
+MAX_WHOLE_DIGITS = 15
+
+#: Columns that :meth:`LineItems.group_sum` can group by.
+KEYS = ("rfp_number", "cost_object", "gl_account", "month")
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("The reporting module requires NumPy.")
+    return numpy
+
+def _chars(texts):
+    """
+    Return `texts` as a 2-d array of character codes, one row per string,
+    padded with zeros.
+    """
+    np = _numpy()
+    texts = np.asarray(texts, dtype=np.unicode_)
+    width = max(texts.dtype.itemsize // 4, 1)
+    texts = texts.astype("U%d" % width)
+    return texts, texts.view(np.uint32).reshape(len(texts), width)
+
+def _digit_runs(chars, separators, count):
+    """
+    Read the numbers between separators in each row of `chars`. Return a list
+    of `count` pairs of int64 arrays: the value of each field and its number
+    of digits.
+    """
+    np = _numpy()
+    digits = (chars >= ord("0")) & (chars <= ord("9"))
+    values = np.where(digits, chars.astype(np.int64) - ord("0"), 0)
+    field = np.cumsum(separators, axis=1)
+    runs = []
+    for k in range(count):
+        mask = digits & (field == k)
+        seen = np.cumsum(mask, axis=1)
+        length = seen[:, -1:]
+        power = np.power(10, np.where(mask, length - seen, 0))
+        runs.append(((values * power * mask).sum(axis=1), length[:, 0]))
+    return runs
+
+def parse_cents_array(texts):
+    """
+    Parse a sequence of displayed amounts, as :func:`amounts.parse_cents`
+    does, into an int64 array of cents. Return the array and a boolean array
+    that is False where an amount could not be parsed; those amounts are 0.
+
+    Plain amounts such as '$1,234.50' are parsed with array operations;
+    negative amounts and other unusual forms fall back to
+    :func:`amounts.parse_cents`. Amounts too large for an int64 are not
+    valid:
+
+    >>> cents, valid = parse_cents_array(["$1,234.50", "12", "(3.00)",
+    ...                                   "99999999999999999999.00", "n/a"])
+    >>> cents.tolist(), valid.tolist()
+    ([123450, 1200, -300, 0, 0], [True, True, True, False, False])
+    """
+    np = _numpy()
+    texts, chars = _chars(texts)
+    digits = (chars >= ord("0")) & (chars <= ord("9"))
+    points = chars == ord(".")
+    noise = np.zeros(chars.shape, dtype=bool)
+    for c in u"$, \0":
+        noise |= chars == ord(c)
+    (whole, whole_places), (fraction, places) = _digit_runs(chars, points, 2)
+    plain = (digits | points | noise).all(axis=1) & \
+            (points.sum(axis=1) <= 1) & (places <= 2) & digits.any(axis=1) & \
+            (whole_places <= MAX_WHOLE_DIGITS)
+    cents = whole * 100 + fraction * np.power(10, 2 - np.minimum(places, 2))
+    cents[~plain] = 0
+    valid = plain.copy()
+    for i in np.flatnonzero(~plain & (chars != 0).any(axis=1)):
+        parsed = parse_cents(texts[i])
+        if parsed is not None and abs(parsed) < 2 ** 63:
+            cents[i], valid[i] = parsed, True
+    return cents, valid
+
+def parse_month_array(texts):
+    """
+    Parse a sequence of dates in SAPweb's MM/DD/YYYY format (or YYYY-MM-DD)
+    into an int64 array of months, numbered as year * 12 + month - 1.
+    Anything after the date, such as a time, is ignored. Unparseable dates
+    are -1.
+    """
+    np = _numpy()
+    texts, chars = _chars(texts)
+    # ignore everything from the first space on
+    chars = np.where(np.cumsum(chars == ord(" "), axis=1) > 0, 0, chars)
+    slashes = chars == ord("/")
+    dashes = chars == ord("-")
+    iso = dashes.any(axis=1)
+    (first, first_len), (second, second_len), (third, third_len) = \
+        _digit_runs(chars, slashes | dashes, 3)
+    year = np.where(iso, first, third)
+    year = np.where(year < 100, year + 2000, year)
+    month = np.where(iso, second, first)
+    digits = (chars >= ord("0")) & (chars <= ord("9"))
+    valid = (digits | slashes | dashes | (chars == 0)).all(axis=1) & \
+            ((slashes | dashes).sum(axis=1) == 2) & \
+            ~(slashes.any(axis=1) & iso) & \
+            (first_len > 0) & (second_len > 0) & (third_len > 0) & \
+            (month >= 1) & (month <= 12)
+    return np.where(valid, year * 12 + month - 1, -1)
+
+def format_month(month):
+    """
+    Format a month number from :func:`parse_month_array` as 'YYYY-MM', or
+    return None for -1.
+    """
+    if month < 0:
+        return None
+    return "%04d-%02d" % (month // 12, month % 12 + 1)
+
+class LineItems(object):
+    """
+    Line items as columns: `rfp_number`, `cost_object` and `gl_account` are
+    string arrays, `month` and `cents` are int64 arrays (see
+    :func:`parse_month_array` and :func:`parse_cents_array`), and `valid` is
+    False for line items whose amount could not be parsed.
+    """
+    def __init__(self, rfp_number, cost_object, gl_account, date_of_service,
+                 amount):
+        np = _numpy()
+        self.rfp_number = np.asarray(rfp_number, dtype=np.unicode_)
+        self.cost_object = np.asarray(cost_object, dtype=np.unicode_)
+        self.gl_account = np.asarray(gl_account, dtype=np.unicode_)
+        self.month = parse_month_array(date_of_service)
+        self.cents, self.valid = parse_cents_array(amount)
+
+    def __len__(self):
+        return len(self.cents)
+
+    @classmethod
+    def from_details(cls, details):
+        """
+        Build from an iterable of dictionaries as returned by
+        :func:`rfp.view`.
+        """
+        columns = ([], [], [], [], [])
+        for rfp_details in details:
+            number = rfp.normalize_rfp_number(rfp_details["rfp_number"])
+            for li in rfp_details["line_items"]:
+                columns[0].append(number)
+                columns[1].append(li["cost_object"] or u"")
+                columns[2].append(li["gl_account"] or u"")
+                columns[3].append(li["date_of_service"] or u"")
+                columns[4].append(li["amount"] or u"")
+        return cls(*columns)
+
+    def total(self):
+        """
+        Return the sum of all parseable amounts, in cents.
+        """
+        return int(self.cents.sum())
+
+    def group_sum(self, by=("cost_object", "gl_account", "month")):
+        """
+        Sum amounts by the given columns, any of :data:`KEYS`. Return a
+        dictionary mapping tuples of key values to integer cents; months are
+        formatted as by :func:`format_month`.
+        """
+        np = _numpy()
+        if not len(self):
+            return {}
+        uniques, codes = [], []
+        for key in by:
+            if key not in KEYS:
+                raise ValueError("Cannot group by %r." % (key,))
+            values, inverse = np.unique(getattr(self, key),
+                                        return_inverse=True)
+            uniques.append(values)
+            codes.append(inverse)
+        # lexsort sorts by the last key first
+        order = np.lexsort(codes[::-1])
+        codes = [c[order] for c in codes]
+        changed = np.zeros(len(order), dtype=bool)
+        changed[0] = True
+        for c in codes:
+            changed[1:] |= c[1:] != c[:-1]
+        starts = np.flatnonzero(changed)
+        sums = np.add.reduceat(self.cents[order], starts)
+        columns = []
+        for key, values, c in zip(by, uniques, codes):
+            column = values[c[starts]].tolist()
+            if key == "month":
+                column = [format_month(m) for m in column]
+            columns.append(column)
+        return dict(zip(zip(*columns), (int(s) for s in sums)))
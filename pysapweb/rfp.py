@@ -8,8 +8,15 @@
     updates and lookup.
 """
 
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.support.select import Select
+import functools
+import itertools
+import os
+from contextlib import contextmanager
+
+from pysapweb import dom, history, payees as payee_index, throttle, tracing
+from pysapweb.amounts import parse_cents
+from pysapweb.checkpoint import file_digest
+from pysapweb.dom import NoSuchElementException
 
 def create(browser,
            name='',
@@ -18,7 +25,11 @@ def create(browser,
            line_items=(),
            office_note='',
            receipts=(),
-           send_to=None):
+           send_to=None,
+           checkpoint=None,
+           validator=None,
+           payees=None,
+           skipped=None):
     """
     Create an RFP Reimbursement. Exposes the most common options for both MIT
     and non-MIT payees.
@@ -36,78 +47,334 @@ def create(browser,
     :param office_note: note to central office, optional
     :param receipts: list of filenames to upload
     :param send_to: tuple of (recipient, note), optional
+    :param checkpoint: :class:`checkpoint.Checkpoint` recording progress,
+        optional
+    :param validator: :class:`validation.Validator` to check the other
+        arguments with before starting, optional
+    :param payees: :class:`payees.PayeeDirectory` of payees seen before,
+        optional
+    :param skipped: list to which a (receipt, duplicate_of) tuple is appended
+        for each receipt that is skipped, optional
 
     All fields should be passed as strings. `is_mit` is a boolean indicating
     if the payee is a current student/employee. `country` and `state` may be
     specified by full name or two-letter abberviation. For `amount`, use USD
     but do not include the dollar sign.
 
+    If a checkpoint is given, its key is appended to the RFP name and each
+    completed step is recorded in it. Retrying with the same checkpoint after
+    a failure finds the RFP that was already saved, if any, and continues with
+    the receipts not yet attached and the send-to step.
+
+    If a validator is given and finds problems with the arguments,
+    :class:`validation.ValidationError` is raised before any page is loaded.
+    Once the RFP is saved, its cost objects and G/L accounts are added to
+    those known to the validator.
+
+    Receipts with the same contents as one listed before them, or (with a
+    checkpoint) as one already attached to the RFP, are skipped; see
+    :func:`unique_receipts`. Skipped receipts are added to `skipped` and
+    listed in the checkpoint's `skipped` attribute.
+
+    If the payee search finds several people, the one meant is picked by
+    kerberos name, name and department (see :func:`payees.choose`), so
+    `name` may also be a kerberos name or a full search result such as
+    'Tim D. Beaver (tbeaver,Mechanical Engineering)'. The search is widened
+    if it finds nobody. With a directory, payees given by kerberos name are
+    searched for by their full name, and every result is remembered. A payee
+    is never picked for a merely similar name: if none fits exactly,
+    :class:`FailedTransitionError` is raised, listing any similar results.
+
     Return the number of the created RFP, as a string.
     """
+    if validator is not None:
+        validator.validate(name=name, payee=payee, address=address,
+                           line_items=line_items, office_note=office_note,
+                           receipts=receipts, send_to=send_to)
+    rfp_number = None
+    if checkpoint is not None:
+        name = checkpoint.tag(name)
+        if checkpoint.rfp_number is None:
+            with tracing.span("create.find_existing", key=checkpoint.key):
+                checkpoint.record(rfp_number=_find_by_name(browser, name))
+        rfp_number = checkpoint.rfp_number
+        if checkpoint.sent:
+            send_to = None
+    digests = {}
+    receipts, duplicates = unique_receipts(receipts, checkpoint, digests)
+    if checkpoint is not None:
+        for receipt, duplicate_of in duplicates:
+            checkpoint.skip(receipt, duplicate_of)
+    if skipped is not None:
+        skipped.extend(duplicates)
+
+    with tracing.span("create", line_items=len(line_items),
+                      receipts=len(receipts), skipped_receipts=len(duplicates),
+                      resumed=bool(rfp_number)) as span:
+        if rfp_number is not None:
+            if not receipts and not send_to:
+                return rfp_number
+            with tracing.span("create.resume", rfp_number=rfp_number):
+                page = InboxPage(browser).select(rfp_number)
+        else:
+            page = _fill_and_save(browser, name, payee, address, line_items,
+                                  office_note, payees)
+            rfp_number = page.rfp_number()
+            if checkpoint is not None:
+                checkpoint.record(rfp_number=rfp_number)
+            if validator is not None:
+                validator.learn(line_items)
+                validator.save()
+        span.set(rfp_number=rfp_number)
+
+        # Attach Receipts
+        page = _attach_receipts(page, receipts, checkpoint, digests)
+
+        # Send To?
+        if send_to:
+            _send_to(page, send_to)
+            if checkpoint is not None:
+                checkpoint.record(sent=True)
+        return rfp_number
+
+def _fill_and_save(browser, name, payee, address, line_items, office_note,
+                   payees=None):
+    """
+    Fill in a new RFP Reimbursement as described in :func:`create` and save
+    it. Return the resulting :class:`AttachReceiptPage`.
+    """
     # Search for Payee
     is_mit = payee[0]
     payee_name = payee[1]
-    # --- search ---
-    page = CreateReimbursementPage(browser)
-    page.is_mit(is_mit)
-    page.payee_name(payee_name)
-    page.search()
-    # --- results ---
-    assert len(page.results()) == 1
-    page = page.results(0)
-
-    # RFP Details
-    page.rfp_name(name)
+    with tracing.span("create.payee_search", is_mit=is_mit) as span:
+        page = CreateReimbursementPage(browser)
+        page.is_mit(is_mit)
+        index = _search_payee(page, payee_name, payees)
+        span.set(index=index)
+        page = page.results(index)
+
+    with tracing.span("create.form_fill", line_items=len(line_items)):
+        # RFP Details
+        page.rfp_name(name)
+
+        # Mailing Address
+        if address:
+            if len(address) == 5:
+                address_line, city, state, postal_code, country = address
+            elif len(address) == 4:
+                address_line, city, postal_code, country = address
+            else:
+                raise IndexError("address has an improper length.")
+            # -- entry ---
+            page.country(country)
+            page.address(address_line)
+            page.city(city)
+            try:
+                page.state(state)
+            except NameError:
+                pass
+            page.postal_code(postal_code)
+
+        # Line Items
+        page.set_line_items(line_items)
+
+        # Office Note
+        page.office_note(office_note)
+
+    with tracing.span("create.save"):
+        return page.save()
+
+def _search_payee(page, query, payees=None):
+    """
+    Search for the payee identified by `query` on a
+    :class:`SearchForPayeePage`, trying the names given by
+    :func:`payees.search_terms` until one search finds them. Return the index
+    of their result.
+    """
+    terms = payee_index.search_terms(query, payees)
+    candidates = []
+    for term in terms:
+        # --- search ---
+        page.payee_name(term)
+        page.search()
+        # --- results ---
+        results = page.results()
+        if payees is not None:
+            payees.add_results(results)
+            payees.save()
+        # a wider search may find only someone else
+        index = payee_index.choose(results, query, payees,
+                                   single=term == terms[0])
+        if index is not None:
+            return index
+        candidates = candidates or [results[i] for i in
+                                    payee_index.rank(results, query)]
+    if candidates:
+        raise FailedTransitionError("Payee %s is ambiguous; similar results: "
+                                    "%s." % (query, "; ".join(candidates[:5])))
+    raise FailedTransitionError("Payee %s could not be identified." % query)
+
+def create_from_template(browser, template_rfp, **overrides):
+    """
+    Create an RFP by cloning an existing one and changing only the fields that
+    differ from it. The template must be cloneable from the inbox (see
+    :meth:`InboxPage.is_cloneable`); the payee is always kept.
+
+    :param browser: WebDriver instance to use
+    :param template_rfp: number of the RFP to clone
+    :param overrides: any of the keyword arguments to :func:`create` other
+        than `payee`, `checkpoint`, `validator` and `payees`, in the same
+        format
+
+    Fields not given in `overrides` are kept as they are in the template.
+    Receipts are never cloned, so `receipts` lists every file to upload;
+    files with the same contents are uploaded once.
+
+    Return the number of the created RFP, as a string.
+    """
+    unknown = set(overrides) - set(["name", "address", "line_items",
+                                    "office_note", "receipts", "send_to",
+                                    "skipped"])
+    if unknown:
+        raise TypeError("Unexpected arguments: %s" % ", ".join(sorted(unknown)))
+    with tracing.span("create_from_template", template_rfp=template_rfp,
+                      overrides=sorted(overrides)) as span:
+        template = view(browser, template_rfp)
+
+        # Clone
+        with tracing.span("create_from_template.clone"):
+            page = InboxPage(browser)
+            if not page.is_cloneable(template_rfp):
+                raise FailedTransitionError("RFP %s cannot be cloned." %
+                                            template_rfp)
+            page = page.clone(template_rfp)
+
+        # RFP Details
+        if "name" in overrides and \
+           not _same_value(overrides["name"], template["rfp_name"]):
+            page.rfp_name(overrides["name"])
+
+        # Mailing Address
+        if overrides.get("address"):
+            address = overrides["address"]
+            if len(address) == 5:
+                address_line, city, state, postal_code, country = address
+            elif len(address) == 4:
+                address_line, city, postal_code, country = address
+                state = None
+            else:
+                raise IndexError("address has an improper length.")
+            # changing the country may clear the other fields, so rewrite all
+            moved = not _same_value(country, template["country"])
+            if moved:
+                page.country(country)
+            if moved or not _same_value(address_line, template["address"]):
+                page.address(address_line)
+            if moved or not _same_value(city, template["city"]):
+                page.city(city)
+            if state is not None and \
+               (moved or not _same_value(state, template["state"])):
+                page.state(state)
+            if moved or not _same_value(postal_code, template["postal_code"]):
+                page.postal_code(postal_code)
+
+        # Line Items
+        if "line_items" in overrides:
+            keys = ("date_of_service", "gl_account", "cost_object", "amount",
+                    "explanation")
+            items = overrides["line_items"]
+            cloned = template["line_items"]
+            changed = len(items) != len(cloned)
+            for item, li in zip(items, cloned):
+                for key, val in zip(keys, item):
+                    changed = changed or \
+                              not _same_value(val, li[key], key == "amount")
+            if changed:
+                page.set_line_items(items)
+
+        # Office Note
+        if "office_note" in overrides and \
+           not _same_value(overrides["office_note"], template["office_note"]):
+            page.office_note(overrides["office_note"])
+        with tracing.span("create_from_template.save"):
+            page.save()
+            if page.errors():
+                raise FailedTransitionError("The cloned RFP could not be "
+                                            "saved.")
+
+        # Attach Receipts
+        receipts, duplicates = unique_receipts(overrides.get("receipts", ()))
+        if overrides.get("skipped") is not None:
+            overrides["skipped"].extend(duplicates)
+        span.set(skipped_receipts=len(duplicates))
+        page = _attach_receipts(page, receipts)
+
+        rfp_number = page.rfp_number()
+        span.set(rfp_number=rfp_number)
+
+        # Send To?
+        if overrides.get("send_to"):
+            _send_to(page, overrides["send_to"])
+        return rfp_number
+
+def unique_receipts(receipts, checkpoint=None, digests=None):
+    """
+    Split a list of receipt files into those to attach and those to skip,
+    because their contents are the same as those of a receipt earlier in
+    the list or, if a :class:`checkpoint.Checkpoint` is given, of a receipt
+    it records as attached.
 
-    # Mailing Address
-    if address:
-        if len(address) == 5:
-            address_line, city, state, postal_code, country = address
-        elif len(address) == 4:
-            address_line, city, postal_code, country = address
+    Return a tuple of (receipts, skipped): the receipts to attach, in order,
+    and a list of (receipt, duplicate_of) tuples, where `duplicate_of` is
+    the receipt with the same contents that is attached instead.
+
+    If `digests` is given, the :func:`checkpoint.file_digest` of each receipt
+    is stored in it, keyed by receipt, so the files need not be read again.
+    """
+    unique = []
+    skipped = []
+    seen = {}
+    for receipt in receipts:
+        digest = file_digest(receipt)
+        if digests is not None:
+            digests[receipt] = digest
+        if checkpoint is not None and checkpoint.is_attached(receipt, digest):
+            skipped.append((receipt, checkpoint.digests.get(digest, receipt)))
+        elif digest in seen:
+            skipped.append((receipt, seen[digest]))
         else:
-            raise IndexError("address has an improper length.")
-        # -- entry ---
-        page.country(country)
-        page.address(address_line)
-        page.city(city)
-        try:
-            page.state(state)
-        except NameError:
-            pass
-        page.postal_code(postal_code)
-
-    # Line Items
-    i = 0
-    for date_of_service, gl_account, cost_object, amount, explanation \
-        in line_items:
-
-        if i > 0:
-            page.add_line()
-        page.date_of_service(i, date_of_service)
-        page.gl_account(i, gl_account)
-        page.cost_object(i, cost_object)
-        page.amount(i, amount)
-        page.explanation(i, explanation)
-        i += 1
-
-    # Office Note
-    page.office_note(office_note)
-    page = page.save()
-
-    # Attach Receipts
+            seen[digest] = receipt
+            unique.append(receipt)
+    return unique, skipped
+
+def _attach_receipts(page, receipts, checkpoint=None, digests=None):
+    """
+    Upload each of the given files, starting from either an
+    :class:`AttachReceiptPage` or a :class:`ViewAndEditPage`. Return the page
+    shown once the receipt overlay is closed. Each upload is recorded in
+    `checkpoint`, if given, with the hash of its contents, taken from
+    `digests` if it is there.
+    """
     for receipt in receipts:
-        if isinstance(page, ViewAndEditPage):
-            page = page.attach_receipt()
-        page.select_file(receipt)
-        page = page.attach()
-    if not receipts:
+        with tracing.span("attach_receipt", path=receipt,
+                          size=os.path.getsize(receipt)):
+            if isinstance(page, ViewAndEditPage):
+                page = page.attach_receipt()
+            page.select_file(receipt)
+            page = page.attach()
+        if checkpoint is not None:
+            digest = (digests or {}).get(receipt) or file_digest(receipt)
+            checkpoint.attached(receipt, digest)
+    if isinstance(page, AttachReceiptPage):
         page = page.cancel()
+    return page
 
-    rfp_number = page.rfp_number()
-
-    # Send To?
-    if send_to:
+def _send_to(page, send_to):
+    """
+    Send the RFP shown on `page` to the recipient in the tuple `send_to`, which
+    is (recipient, note). Return an instance of :class:`ViewOnlyPage`.
+    """
+    with tracing.span("send_to"):
         page = page.send_to()
         recipient = send_to[0]
         note = send_to[1]
@@ -116,8 +383,41 @@ def create(browser,
         page.search()
         assert len(page.results()) == 1
         page.note(note)
-        page = page.send()
-    return rfp_number
+        return page.send()
+
+def _find_by_name(browser, name):
+    """
+    Search for an RFP by its exact name. Return its number, or None if no RFP
+    has that name.
+    """
+    page = SearchPage(browser)
+    page.rfp_types(parked=True, posted=True)
+    page.rfp_name(name)
+    try:
+        page = page.search()
+    except FailedTransitionError:
+        # SAPweb reports a search with no results as an error
+        return None
+    if isinstance(page, ViewOnlyPage):
+        return page.rfp_number()
+    results = page.results()
+    if len(results) > 1:
+        raise FailedTransitionError("Several RFPs are named %s." % name)
+    return normalize_rfp_number(results[0]) if results else None
+
+def _same_value(given, shown, amount=False):
+    """
+    Compare a value passed to :func:`create` with the value shown for it by
+    :func:`view`, ignoring surrounding whitespace. If `amount` is True, both
+    are compared as amounts of money, so '1234.5' matches '$1,234.50'.
+    """
+    if shown is None:
+        return given in (None, "")
+    if amount:
+        cents = parse_cents(given)
+        if cents is not None:
+            return cents == parse_cents(shown)
+    return ("%s" % (given,)).strip() == ("%s" % (shown,)).strip()
 
 def view(browser, rfp_number):
     """
@@ -140,51 +440,272 @@ def view(browser, rfp_number):
     The line_items key is a list of dictionaries, each containing:
     date_of_service, gl_account, cost_object, amount, explanation.
     """
-    # Search for RFP
-    page = SearchPage(browser)
-    page.rfp_number(rfp_number)
-    page = page.search()
-    assert isinstance(page, ViewOnlyPage) # a single result found
-
-    # View RFP
-    details = {}
-    details['rfp_number'] = rfp_number
-    details['inbox'] = page.inbox()
-    assert page.rfp_number() == rfp_number
-    details['payee'] = page.payee()
-    details['company_code'] = page.company_code()
-    details['rfp_name'] = page.rfp_name()
-    details['rfp_type'] = page.rfp_type()
-    details['payment_method'] = page.payment_method()
-    details['mailing_instructions'] = page.mailing_instructions()
-    details['addressee'] = page.addressee()
-    details['phone'] = page.phone()
-    details['address'] = page.address()
-    details['city'] = page.city()
-    details['state'] = page.state()
-    details['postal_code'] = page.postal_code()
-    details['country'] = page.country()
-    details['tax_type'] = page.tax_type()
-    details['ssn_tin'] = page.ssn_tin()
-    details['line_items'] = []
-    for i in range(page.line_item_count()):
-        li = {}
-        li['date_of_service'] = page.date_of_service(i)
-        li['gl_account'] = page.gl_account(i)
-        li['cost_object'] = page.cost_object(i)
-        li['amount'] = page.amount(i)
-        li['explanation'] = page.explanation(i)
-        details['line_items'].append(li)
-    details['office_note'] = page.office_note()
-    details['history'] = page.history()
-    return details
+    with tracing.span("view", rfp_number=rfp_number):
+        # Search for RFP
+        with tracing.span("view.search"):
+            page = SearchPage(browser)
+            page.rfp_number(rfp_number)
+            page = page.search()
+            assert isinstance(page, ViewOnlyPage) # a single result found
+
+        # View RFP
+        with tracing.span("view.extract") as extract:
+            details = page.read_all()
+            assert details['rfp_number'] == rfp_number
+            details['line_items'] = []
+            for i in range(page.line_item_count()):
+                li = {}
+                li['date_of_service'] = page.date_of_service(i)
+                li['gl_account'] = page.gl_account(i)
+                li['cost_object'] = page.cost_object(i)
+                li['amount'] = page.amount(i)
+                li['explanation'] = page.explanation(i)
+                details['line_items'].append(li)
+            details['history'] = page.history()
+            extract.set(line_items=len(details['line_items']))
+        return details
+
+def search(browser, parked=False, posted=False, deleted=False, **criteria):
+    """
+    Search for RFPs and return the results as a list of dictionaries, as
+    :meth:`SearchPage.result_table` does.
+
+    :param browser: WebDriver instance to use
+    :param parked: include parked RFPs
+    :param posted: include posted RFPs
+    :param deleted: include deleted RFPs
+    :param criteria: values of the fields of :class:`SearchPage`, e.g.
+        cost_object='6666666'
+
+    If none of `parked`, `posted` and `deleted` is set, SAPweb's default
+    RFP types are searched. If a single RFP is found, its result has only
+    the keys rfp_number, payee, rfp_name and location_status.
+    """
+    with tracing.span("search", criteria=sorted(criteria)) as span:
+        page = SearchPage(browser)
+        values = dict(criteria)
+        if parked or posted or deleted:
+            values.update(parked=parked, posted=posted, deleted=deleted)
+        page.write_all(values)
+        try:
+            page = page.search()
+        except FailedTransitionError:
+            # SAPweb reports a search with no results as an error
+            return []
+        if isinstance(page, ViewOnlyPage):
+            results = [{"rfp_number": page.rfp_number(),
+                        "payee": page.payee(), "rfp_name": page.rfp_name(),
+                        "location_status": page.inbox()}]
+        else:
+            results = page.result_table()
+        span.set(results=len(results))
+        return results
+
+def normalize_rfp_number(rfp_number):
+    """
+    Return an RFP number without surrounding whitespace or leading zeros, as
+    SAPweb shows it outside of search results.
+    """
+    return rfp_number.strip().lstrip("0")
+
+def _memoized(method):
+    """
+    Cache the result of a page method, by its arguments, against the page's
+    :meth:`BasePage.fingerprint`, so the page is only read again once it has
+    changed. The first call on a page object reads the page without taking a
+    fingerprint, so reading a page once costs no extra request; later calls
+    take one, and read the page only if it changed. Each call returns a copy
+    of the cached lists and dictionaries, which callers may modify.
+    """
+    name = method.__name__
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        if key not in self._memo:
+            self._memo[key] = (None, method(self, *args, **kwargs))
+        else:
+            fingerprint = self.fingerprint()
+            if self._memo[key][0] != fingerprint:
+                self._memo[key] = (fingerprint, method(self, *args, **kwargs))
+        return _copied(self._memo[key][1])
+    return wrapper
+
+def _copied(value):
+    """
+    Return a copy of `value` in which every list and dictionary is new.
+    """
+    if isinstance(value, list):
+        return [_copied(item) for item in value]
+    if isinstance(value, dict):
+        return dict((key, _copied(item)) for key, item in value.items())
+    return value
+
+# Payee types, with the values of the 'MIT/Non-MIT' radio buttons
+MIT = "MIT"
+NON_MIT = "NONMIT"
+
+# Kinds of Field: the form controls of BasePage._textbox(), _select(),
+# _radio() and _checkbox(), labelled values read by _datalist(), and other
+# read-only text located by XPath
+TEXTBOX = "textbox"
+SELECT = "select"
+RADIO = "radio"
+CHECKBOX = "checkbox"
+DATALIST = "datalist"
+TEXT = "text"
+
+class Field(object):
+    """
+    A field of a page, declared in the body of the page class::
+
+        rfp_name = Field(TEXTBOX, "#rfpName", "Payment Details",
+                         doc="Get or set the field 'Name this RFP'.")
+
+    On a page, the attribute is a method that gets the field, or sets it if
+    given a value; fields of kind DATALIST and TEXT are read-only. Every field
+    can also be read and written together with the others, using
+    :meth:`BasePage.read_all` and :meth:`BasePage.write_all`.
+
+    :param kind: TEXTBOX, SELECT, RADIO, CHECKBOX, DATALIST or TEXT
+    :param locator: a CSS selector for TEXTBOX and CHECKBOX, a fragment of one
+        (e.g. '#coCode') for SELECT, the group name for RADIO, the row
+        header for DATALIST and an XPath for TEXT. '{page.index}' and the
+        like are filled in from the page.
+    :param section: name of the section of the page the field is in
+    :param payees: payee types (:data:`MIT`, :data:`NON_MIT`) the field
+        applies to
+    :param values: for a RADIO group that is read as a boolean, the values
+        of its (True, False) buttons
+    :param optional: if True, reading a field that is not shown returns None
+        rather than raising a NoSuchElementException
+    """
+    _count = itertools.count()
+
+    def __init__(self, kind, locator, section=None, payees=(MIT, NON_MIT),
+                 values=None, optional=False, doc=None):
+        self.name = None
+        self.kind = kind
+        self.locator = locator
+        self.section = section
+        self.payees = payees
+        self.values = values
+        self.optional = optional
+        self.__doc__ = doc
+        # declaration order, in which write_all() sets fields
+        self.order = next(Field._count)
+
+    @property
+    def read_only(self):
+        return self.kind in (DATALIST, TEXT)
+
+    def __get__(self, page, cls=None):
+        if page is None:
+            return self
+        if self.name is None:
+            type(page).fields()
+        if self.read_only:
+            def accessor():
+                return self.get(page)
+        else:
+            def accessor(val=None):
+                if val is None:
+                    return self.get(page)
+                self.set(page, val)
+        accessor.__name__ = self.name
+        accessor.__doc__ = self.__doc__
+        return accessor
+
+    def get(self, page):
+        """
+        Return the value of the field on `page`.
+        """
+        locator = self.locator.format(page=page)
+        if self.kind == TEXTBOX:
+            value = page._textbox(locator)
+        elif self.kind == SELECT:
+            value = page._select(locator)
+        elif self.kind == RADIO:
+            value = page._radio(locator)
+        elif self.kind == CHECKBOX:
+            value = page._checkbox(locator)
+        else:
+            try:
+                if self.kind == DATALIST:
+                    value = page._datalist(locator)
+                else:
+                    value = page.dom.xpath(locator).text
+            except NoSuchElementException:
+                if not self.optional:
+                    raise
+                return None
+        return self.load(value)
+
+    def set(self, page, val):
+        """
+        Set the field on `page` to `val`.
+        """
+        locator = self.locator.format(page=page)
+        val = self.dump(val)
+        if self.kind == TEXTBOX:
+            page._textbox(locator, val)
+        elif self.kind == SELECT:
+            page._select(locator, val)
+        elif self.kind == RADIO:
+            page._radio(locator, val)
+        elif self.kind == CHECKBOX:
+            page._checkbox(locator, val)
+        else:
+            raise ValueError("Field %s is read-only." % self.name)
+
+    def load(self, value):
+        """
+        Convert a value read from the page to the value returned.
+        """
+        if self.values is not None:
+            return value == self.values[0]
+        return value
+
+    def dump(self, val):
+        """
+        Convert a value to set into the value written to the page.
+        """
+        if self.values is not None:
+            return self.values[0] if val else self.values[1]
+        return val
+
+    def spec(self, page):
+        """
+        Return the (kind, locator) pair describing the field to
+        :meth:`dom.Document.read_fields`.
+        """
+        locator = self.locator.format(page=page)
+        if self.kind == TEXTBOX:
+            return (dom.INPUT, locator)
+        elif self.kind == SELECT:
+            return (dom.SELECT, "select" + locator)
+        elif self.kind == RADIO:
+            return (dom.RADIO, locator)
+        elif self.kind == CHECKBOX:
+            return (dom.CHECKBOX, locator)
+        elif self.kind == DATALIST:
+            return (dom.TEXT, _datalist_xpath(locator))
+        return (dom.TEXT, locator)
+
+def _datalist_xpath(label):
+    """
+    Return the XPath of the value labelled `label` in a table, as read by
+    :meth:`BasePage._datalist`.
+    """
+    xpath = "//div[normalize-space(.)='%s']/../../td[@class='data']" % label
+    xpath += " | //th[normalize-space(.)='%s']/../td" % label
+    return xpath
 
 class BasePage(object):
     """
-    Represents a web page loaded through Selenium. Each page is a child class of
-    BasePage. Pages have fields, which may be read-write or read-only, and
-    actions, which return a new page. Includes common methods for interacting
-    with SAPweb pages.
+    Represents a web page, either loaded through Selenium or parsed from HTML
+    (see :mod:`dom`). Each page is a child class of BasePage. Pages have
+    fields, which may be read-write or read-only, and actions, which return a
+    new page. Includes common methods for interacting with SAPweb pages.
 
     .. warning::
        Most pages should not be accessed directly, as SAPweb often requires that
@@ -192,12 +713,47 @@ class BasePage(object):
        whether or not they are an "entry page" in their documentation.
     """
     entry_url = None
+    # CSS selector for the part of the page covered by fingerprint()
+    fingerprint_region = "body"
 
     def __init__(self, browser):
         self.browser = browser
+        self.dom = dom.document(browser)
+        self.last_fingerprint = None
+        self._memo = {}
         # If this page is an entry, navigate to the entry URL.
         if self.entry_url:
-            self.browser.get(self.entry_url)
+            with self._transition(type(self).__name__):
+                self.dom.get(self.entry_url)
+
+    @contextmanager
+    def _transition(self, label):
+        """
+        Wrap an action that loads a new page or changes the current one in
+        place. `label` names the action, e.g. 'SearchPage.search'.
+        """
+        with tracing.span("transition", label=label):
+            with throttle.request(self.dom):
+                yield
+            _checkpoint(self.browser, label)
+
+    def fingerprint(self):
+        """
+        Return a hash of the page's content and form values, computed in the
+        browser in a single request, and keep it as `last_fingerprint`. The
+        hash changes whenever the page does, including when an action
+        refreshes it in place.
+        """
+        self.last_fingerprint = self.dom.fingerprint(self.fingerprint_region)
+        return self.last_fingerprint
+
+    def changed(self):
+        """
+        Return True if the page has changed since :meth:`fingerprint` was
+        last called (or if it never was).
+        """
+        last = self.last_fingerprint
+        return self.fingerprint() != last
 
     def _pre_transition(self):
         """
@@ -215,24 +771,85 @@ class BasePage(object):
         that an attempted action has failed.
         """
         # Regular Errors
-        browsermulticss = self.browser.find_elements_by_css_selector
-        errors = [e.text for e in browsermulticss('.portlet-msg-error')]
-        errors += [e.text for e in browsermulticss('label.jqerror')]
+        dommulticss = self.dom.css_all
+        errors = [e.text for e in dommulticss('.portlet-msg-error')]
+        errors += [e.text for e in dommulticss('label.jqerror')]
         return errors
 
     def info(self):
         """
         Return a list of informational messages shown by the SAPweb UI.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        return [e.text for e in browsermulticss('.portlet-msg-alert')]
+        dommulticss = self.dom.css_all
+        return [e.text for e in dommulticss('.portlet-msg-alert')]
 
     def success(self):
         """
         Return a list of success messages shown by the SAPweb UI.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        return [e.text for e in browsermulticss('.portlet-msg-success')]
+        dommulticss = self.dom.css_all
+        return [e.text for e in dommulticss('.portlet-msg-success')]
+
+    @classmethod
+    def fields(cls, section=None, payee_type=None):
+        """
+        Return the :class:`Field` declarations of this page, in the order
+        they are declared, optionally only those in the named `section` or
+        applying to `payee_type` (:data:`MIT` or :data:`NON_MIT`).
+        """
+        schema = cls.__dict__.get("_schema")
+        if schema is None:
+            found = {}
+            for klass in reversed(cls.__mro__):
+                for name, attr in vars(klass).items():
+                    if isinstance(attr, Field):
+                        attr.name = name
+                        found[name] = attr
+                    else:
+                        # overridden by a hand-written method
+                        found.pop(name, None)
+            schema = sorted(found.values(), key=lambda field: field.order)
+            cls._schema = schema
+        return [field for field in schema
+                if (section is None or field.section == section) and
+                   (payee_type is None or payee_type in field.payees)]
+
+    @_memoized
+    def read_all(self, section=None, payee_type=None):
+        """
+        Return the values of the fields given by :meth:`fields` as a
+        dictionary by field name. Fields are read in a single request to the
+        browser; fields that are not shown read as None. Reading them again
+        from an unchanged page, e.g. after :meth:`ViewAndEditPage.save`,
+        costs only a fingerprint request.
+        """
+        fields = self.fields(section, payee_type)
+        values = self.dom.read_fields([field.spec(self) for field in fields])
+        return dict((field.name, field.load(value))
+                    for field, value in zip(fields, values))
+
+    def write_all(self, values):
+        """
+        Set the fields named in the dictionary `values`, in the order they are
+        declared, in a single request to the browser. Does not cause a page
+        reload. Raise a NoSuchElementException naming any field that is not
+        shown, after setting the others.
+        """
+        schema = dict((field.name, field) for field in self.fields())
+        unknown = [name for name in values
+                   if name not in schema or schema[name].read_only]
+        if unknown:
+            raise ValueError("Fields cannot be written: %s" %
+                             ", ".join(sorted(unknown)))
+        fields = sorted((schema[name] for name in values),
+                        key=lambda field: field.order)
+        specs = [field.spec(self) + (field.dump(values[field.name]),)
+                 for field in fields]
+        missing = self.dom.write_fields(specs)
+        if missing:
+            raise NoSuchElementException("Fields not found: %s" %
+                                         ", ".join(fields[i].name
+                                                   for i in missing))
 
     def _radio(self, group_name, val=None):
         """
@@ -241,26 +858,26 @@ class BasePage(object):
         group. The selected button is identified by its 'value' attribute. If
         no button is selected, None is returned.
         """
-        browsercss = self.browser.find_element_by_css_selector
+        domcss = self.dom.css
         if val is None:
             try:
                 selector = "input[type='radio'][name='%s']:checked" % \
                            group_name
-                return browsercss(selector).get_attribute("value")
+                return domcss(selector).get_attribute("value")
             except NoSuchElementException:
                 return None
         else:
             selector = "input[type='radio'][name='%s'][value='%s']" % \
                        (group_name, val)
-            browsercss(selector).click()
+            domcss(selector).click()
 
     def _checkbox(self, selector, val=None):
         """
         Get or set the value of a checkbox. True represents 'checked', False
         represents 'unchecked'. The checkbox is identified by a CSS selector.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        elem = browsercss(selector)
+        domcss = self.dom.css
+        elem = domcss(selector)
         if val is None:
             return elem.is_selected()
         else:
@@ -273,8 +890,8 @@ class BasePage(object):
         Get or set the value of a text box. The text box is identified by a CSS
         selector.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        elem = browsercss(selector)
+        domcss = self.dom.css
+        elem = domcss(selector)
         if val is None:
             return elem.get_attribute('value')
         else:
@@ -288,28 +905,25 @@ class BasePage(object):
         `val` can match either the value (preferred, faster) or the displayed
         text.
         """
-        browsercss = self.browser.find_element_by_css_selector
+        domcss = self.dom.css
         if val is None:
             selector = "select%s option:checked" % fragment
-            return browsercss(selector).text.strip()
+            return domcss(selector).text.strip()
         else:
             optselector = "select%s option[value='%s']" % \
                           (fragment, val)
-            val = browsercss(optselector).text.strip()
-
-            select_welem = browsercss("select%s" % fragment)
-            select_elem = Select(select_welem)
-            select_elem.select_by_visible_text(val)
+            option = domcss(optselector)
+            val = option.text.strip()
+            if not option.is_selected():
+                option.click()
             assert self._select(fragment) == val
 
     def _datalist(self, label):
         """
         Get a value out of a table. The row is identified by its header text.
         """
-        browserxp = self.browser.find_element_by_xpath
-        xpath = "//div[normalize-space(.)='%s']/../../td[@class='data']" % label
-        xpath += " | //th[normalize-space(.)='%s']/../td" % label
-        return browserxp(xpath).text
+        domxp = self.dom.xpath
+        return domxp(_datalist_xpath(label)).text
 
     def _try_datalist(self, label):
         """
@@ -326,9 +940,9 @@ class BasePage(object):
         In a table of RFPs, get the specified RFP's row as a list of <td>
         elements.
         """
-        browsermultixp = self.browser.find_elements_by_xpath
+        dommultixp = self.dom.xpath_all
         xpath = "//a[contains(text(), '%s')]/../../td" % rfp
-        return browsermultixp(xpath)
+        return dommultixp(xpath)
 
 class InboxPage(BasePage):
     """
@@ -337,12 +951,41 @@ class InboxPage(BasePage):
     entry_url = "https://insidemit-apps.mit.edu/apps/rfp/InboxEntry.action?gatewayType=admin&sapSystemId=PS1"
     help_url = "http://insidemit.mit.edu/help-apps/rfp_inbox.shtml"
 
+    # Marks the checkbox of each deletable row in arguments[0], clears every
+    # other row's, and returns the RFP numbers that were marked. Mirrors
+    # is_deletable() and mark_for_deletion().
+    _MARK_FOR_DELETION_JS = """
+        var rfps = arguments[0], marked = [];
+        var links = document.querySelectorAll("td.data > a");
+        for (var i = 0; i < links.length; i++) {
+            var text = links[i].textContent;
+            var row = links[i].parentNode.parentNode;
+            var box = row.querySelector("input[type='checkbox']");
+            if (!box) continue;
+            var wanted = null;
+            for (var j = 0; j < rfps.length; j++) {
+                if (text.indexOf(rfps[j]) != -1) {
+                    wanted = rfps[j];
+                    break;
+                }
+            }
+            if (wanted !== null && row.cells[9].textContent.trim() != "n/a") {
+                if (!box.checked) box.click();
+                if (box.checked) marked.push(wanted);
+            } else if (box.checked) {
+                box.click();
+            }
+        }
+        return marked;
+    """
+
+    @_memoized
     def list(self):
         """
         Get a list of displayed RFPs by RFP number (as strings).
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        return [e.text for e in browsermulticss("td.data > a")]
+        dommulticss = self.dom.css_all
+        return [e.text for e in dommulticss("td.data > a")]
 
     def select(self, rfp):
         """
@@ -352,9 +995,10 @@ class InboxPage(BasePage):
         Note that this action may recall the RFP to your inbox. It is
         recommended that you check :meth:`state` before selecting an RFP.
         """
-        browserxp = self.browser.find_element_by_xpath
+        domxp = self.dom.xpath
         xpath = "//a[contains(text(), '%s')]/../../td//a" % rfp
-        browserxp(xpath).click()
+        with self._transition("InboxPage.select"):
+            domxp(xpath).click()
         self._pre_transition()
         return ViewAndEditPage(self.browser)
 
@@ -370,10 +1014,10 @@ class InboxPage(BasePage):
         Get or set whether or not the specified RFP is marked for deletion. True
         if marked, False if unmarked.
         """
-        browserxp = self.browser.find_element_by_xpath
+        domxp = self.dom.xpath
         xpath = ("//a[contains(text(), '%s')]/../../td//" +
                  "input[@type='checkbox']") % rfp
-        elem = browserxp(xpath)
+        elem = domxp(xpath)
         if val is None:
             return elem.is_selected()
         else:
@@ -385,8 +1029,27 @@ class InboxPage(BasePage):
         """
         Click the 'Delete Selected' button. Results load in the same page.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".deleteButton").click()
+        domcss = self.dom.css
+        with self._transition("InboxPage.delete_selected"):
+            domcss(".deleteButton").click()
+
+    def delete_many(self, rfps):
+        """
+        Delete several RFPs at once. Deletable RFPs are marked, and every
+        other RFP unmarked, in a single pass, then 'Delete Selected' is
+        clicked once. RFPs that may not be deleted (see :meth:`is_deletable`)
+        are left alone.
+
+        Return the list of RFPs that no longer appear in the inbox.
+        """
+        marked = self.dom.execute(self._MARK_FOR_DELETION_JS,
+                                  list(rfps))
+        if not marked:
+            return []
+        self.delete_selected()
+        remaining = self.list()
+        return [rfp for rfp in marked
+                if not any(rfp in shown for shown in remaining)]
 
     def is_cloneable(self, rfp):
         """
@@ -404,7 +1067,8 @@ class InboxPage(BasePage):
         Click the 'Clone' button for the specified RFP. Return an instance of
         :class:`ViewAndEditPage`.
         """
-        self._clone_button(rfp).click()
+        with self._transition("InboxPage.clone"):
+            self._clone_button(rfp).click()
         return ViewAndEditPage(self.browser)
 
     def _clone_button(self, rfp):
@@ -412,19 +1076,19 @@ class InboxPage(BasePage):
         Get the 'Clone' button for the specified RFP. If the button does not
         exist, raise a NoSuchElementException.
         """
-        browserxp = self.browser.find_element_by_xpath
+        domxp = self.dom.xpath
         xpath = ("//a[contains(text(), '%s')]/../../td//" +
                  "button[contains(@class, '.clone')]") % rfp
-        return browserxp(xpath)
+        return domxp(xpath)
 
     def state(self, rfp):
         """
         Get the field 'State' for the specified RFP. Options include 'Incoming',
         'Saved', 'Sent On' and 'Rejected'.
         """
-        browsermultixp = self.browser.find_elements_by_xpath
+        dommultixp = self.dom.xpath_all
         xpath = "//a[contains(text(), '%s')]/../../td//img" % rfp
-        results = browsermultixp(xpath)
+        results = dommultixp(xpath)
         if len(results) == 0:
             return None
         elif len(results) == 1:
@@ -468,13 +1132,40 @@ class InboxPage(BasePage):
         """
         return self._row_element(rfp)[8].text
 
+    @_memoized
+    def table(self):
+        """
+        Get every displayed RFP as a dictionary with the keys rfp_number,
+        state, receipt, creation_date, payee, created_by, cost_object and
+        amount, in the order shown. As in :meth:`SearchPage.result_table`, the
+        page is fetched once and parsed locally.
+        """
+        snapshot = self.dom.snapshot()
+        table = []
+        for link in snapshot.css_all("td.data > a"):
+            cells = link.xpath_all("../../td")
+            images = link.xpath_all("../../td//img")
+            state = images[0].get_attribute("alt").title() if images else None
+            table.append({"rfp_number": link.text,
+                          "state": state,
+                          "receipt": cells[2].text == 'Yes',
+                          "creation_date": cells[4].text,
+                          "payee": cells[5].text,
+                          "created_by": cells[6].text,
+                          "cost_object": cells[7].text,
+                          "amount": cells[8].text})
+        return table
+
 def CreateReimbursementPage(browser):
     """
     Encapuslates the Create RFP Reimbursement entry URL, returning an instance
     of :class:`SearchForPayeePage`. Entry page.
     """
     entry_url = "https://insidemit-apps.mit.edu/apps/rfp/SelectPayeeReimbursementEntry.action?sapSystemId=PS1"
-    browser.get(entry_url)
+    document = dom.document(browser)
+    with throttle.request(document):
+        document.get(entry_url)
+    _checkpoint(browser, "CreateReimbursementPage")
     return SearchForPayeePage(browser)
 
 def CreatePaymentPage(browser):
@@ -483,9 +1174,21 @@ def CreatePaymentPage(browser):
     :class:`SearchForPayeePage`. Entry page.
     """
     entry_url = "https://insidemit-apps.mit.edu/apps/rfp/SelectPayeePaymentEntry.action?sapSystemId=PS1"
-    browser.get(entry_url)
+    document = dom.document(browser)
+    with throttle.request(document):
+        document.get(entry_url)
+    _checkpoint(browser, "CreatePaymentPage")
     return SearchForPayeePage(browser)
 
+def _checkpoint(browser, label):
+    """
+    Notify the browser that the page has changed, if it asks to be told (see
+    :class:`recording.RecordingBrowser` and :class:`recording.ReplayBrowser`).
+    """
+    checkpoint = getattr(browser, "checkpoint", None)
+    if checkpoint is not None:
+        checkpoint(label)
+
 class SearchForPayeePage(BasePage):
     """
     The first step of RFP creation, the Search for Payee page. Not an entry
@@ -494,28 +1197,22 @@ class SearchForPayeePage(BasePage):
     """
     help_url = "http://insidemit.mit.edu/help-apps/rfp_select_payee.shtml"
 
-    def is_mit(self, val=None):
-        """
+    is_mit = Field(RADIO, "payeeType", "Search for Payee",
+                   values=(MIT, NON_MIT), doc="""
         Get or set the field 'MIT/Non-MIT'. True if MIT, False if Non-MIT.
-        """
-        if val is None:
-            return self._radio("payeeType") == "MIT"
-        else:
-            text = "MIT" if val else "NONMIT"
-            self._radio("payeeType", text)
+        """)
 
-    def payee_name(self, val=None):
-        """
+    payee_name = Field(TEXTBOX, "#payeeName", "Search for Payee", doc="""
         Get or set the field 'Payee Name'.
-        """
-        return self._textbox("#payeeName", val)
+        """)
 
     def search(self):
         """
         Click the 'Search' button. Results load in the same page.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss("#searchButton").click()
+        domcss = self.dom.css
+        with self._transition("SearchForPayeePage.search"):
+            domcss("#searchButton").click()
 
     def results(self, index=None):
         """
@@ -531,12 +1228,13 @@ class SearchForPayeePage(BasePage):
         specifying a result by its zero-indexed position in the list. Return an
         instance of :class:`RequestRfpPage`.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        results = browsermulticss("#mit a")
+        dommulticss = self.dom.css_all
+        results = dommulticss("#mit a")
         if index is None:
             return [result.text.strip() for result in results]
         else:
-            results[index].click()
+            with self._transition("SearchForPayeePage.results"):
+                results[index].click()
             self._pre_transition()
             return RequestRfpPage(self.browser)
 
@@ -548,22 +1246,50 @@ class RequestRfpPage(BasePage):
     help_urls = ["http://insidemit.mit.edu/help-apps/rfp_reimbursement.shtml",
                  "http://insidemit.mit.edu/help-apps/rfp_payment.shtml"]
 
+    # Clicks 'Add Line' until there are enough lines, then sets every field,
+    # firing the events SAPweb's validation listens for.
+    _SET_LINE_ITEMS_JS = """
+        var items = arguments[0];
+        var prefixes = ["serviceDate", "glAccount", "costObject", "amount",
+                        "description"];
+        var add = document.getElementById("addLine");
+        var count = document.querySelectorAll(".lineItem").length;
+        while (count < items.length) {
+            add.click();
+            var added = document.querySelectorAll(".lineItem").length;
+            if (added == count) break;
+            count = added;
+        }
+        for (var i = 0; i < count; i++) {
+            for (var j = 0; j < prefixes.length; j++) {
+                var elem = document.getElementById(prefixes[j] + "-" + i);
+                if (!elem) continue;
+                elem.value = i < items.length ? items[i][j] : "";
+                var names = ["input", "change", "blur"];
+                for (var k = 0; k < names.length; k++) {
+                    var event = document.createEvent("HTMLEvents");
+                    event.initEvent(names[k], true, false);
+                    elem.dispatchEvent(event);
+                }
+            }
+        }
+    """
+
     def __init__(self, browser):
         super(RequestRfpPage, self).__init__(browser)
         # Select index as a determiner of which address fields to use:
         #  - #country1/#city1/etc. is the permanent address, for RFP Payment
         #      (the mailing address must be the same as this)
         #  - #country2/#city2/etc. is the mailing address, for RFP Reimbursement
-        self.index = 1 if "Payment" in browser.title else 2
+        self.index = 1 if "Payment" in self.dom.title else 2
 
     # Section: Payment Details
-    def payee(self, val=None):
-        """
+    payee = Field(TEXTBOX, "#payee", "Payment Details", payees=(NON_MIT,),
+                  doc="""
         Get or set the field 'Payee'.
 
         Non-MIT payees only.
-        """
-        return self._textbox("#payee", val)
+        """)
 
     def change_payee(self):
         """
@@ -572,26 +1298,23 @@ class RequestRfpPage(BasePage):
 
         MIT payees only.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".changePayeeAction").click()
+        domcss = self.dom.css
+        with self._transition("RequestRfpPage.change_payee"):
+            domcss(".changePayeeAction").click()
         self._pre_transition()
         return SearchForPayeePage(self.browser)
 
-    def charge_to(self, val=None):
-        """
+    charge_to = Field(SELECT, "#coCode", "Payment Details", doc="""
         Get or set the field 'Charge to'.
-        """
-        return self._select("#coCode", val)
+        """)
 
-    def rfp_name(self, val=None):
-        """
+    rfp_name = Field(TEXTBOX, "#rfpName", "Payment Details", doc="""
         Get or set the field 'Name this RFP'.
-        """
-        return self._textbox("#rfpName", val)
+        """)
 
     # Section: Permanent Address
-    def country(self, val=None):
-        """
+    country = Field(SELECT, "#country{page.index}", "Permanent Address",
+                    payees=(NON_MIT,), doc="""
         Get or set the field 'Country' in the permanent address section. In
         addition to full country names, the set operation also supports
         two-leter country codes.
@@ -600,52 +1323,43 @@ class RequestRfpPage(BasePage):
         'State/Region', and 'Postal Code'.
 
         Non-MIT payees only.
-        """
-        selector = "#country%d" % self.index
-        return self._select(selector, val)
+        """)
 
-    def address(self, val=None):
-        """
+    address = Field(TEXTBOX, "#address{page.index}", "Permanent Address",
+                    payees=(NON_MIT,), doc="""
         Get or set the field 'Address' (for RFP Reimbursement, this is the
         mailing address; for RFP Payment, this is both the permanent and
         mailing address---they must be the same).
 
         Non-MIT payees only.
-        """
-        selector = "#address%d" % self.index
-        return self._textbox(selector, val)
+        """)
 
-    def city(self, val=None):
-        """
+    city = Field(TEXTBOX, "#city{page.index}", "Permanent Address",
+                 payees=(NON_MIT,), doc="""
         Get or set the field 'City'.
 
         Non-MIT payees only.
-        """
-        selector = "#city%d" % self.index
-        return self._textbox(selector, val)
+        """)
 
-    def state(self, val=None):
-        """
+    state = Field(SELECT, "#region{page.index}", "Permanent Address",
+                  payees=(NON_MIT,), doc="""
         Get or set the field 'State/Region'. In addition to full state/region
         names, the set operation also supports two-letter state/region codes.
 
         Non-MIT payees in the U.S. or Canada only.
-        """
-        selector = "#region%d" % self.index
-        return self._select(selector, val)
+        """)
 
-    def postal_code(self, val=None):
-        """
+    postal_code = Field(TEXTBOX, "#zip{page.index}", "Permanent Address",
+                        payees=(NON_MIT,), doc="""
         Get or set the field 'Postal Code'.
 
         Non-MIT payees only.
-        """
-        selector = "#zip%d" % self.index
-        return self._textbox(selector, val)
+        """)
 
     # Section: Payee's Tax Information
-    def citizen_alien(self, val=None):
-        """
+    citizen_alien = Field(RADIO, "rfpDocument.payee.usCitizenType",
+                          "Payee's Tax Information", payees=(NON_MIT,),
+                          doc="""
         Get or set the field 'Is payee a US citizen or a resident alien?' in the
         tax information section. Values are 'Y' (yes), 'N' (no), 'C' (payee is
         not an individual), or None (not yet set).
@@ -654,92 +1368,78 @@ class RequestRfpPage(BasePage):
         'Country of Citizenship'.
 
         Non-MIT payees only.
-        """
-        return self._radio("rfpDocument.payee.usCitizenType", val)
+        """)
 
-    def ssn_tin(self, val=None):
-        """
+    ssn_tin = Field(TEXTBOX, "#ssnTin", "Payee's Tax Information", doc="""
         Get or set the field 'SSN/TIN' in the tax information section.
-        """
-        return self._textbox("#ssnTin", val)
+        """)
 
-    def visa(self, val=None):
-        """
+    visa = Field(TEXTBOX, "#visaType", "Payee's Tax Information",
+                 payees=(NON_MIT,), doc="""
         Get or set the field 'Type of Visa' in the tax information section.
 
         Individual non-citizen payees only.
-        """
-        return self._textbox("#visaType", val)
+        """)
 
-    def citizenship(self, val=None):
-        """
+    citizenship = Field(SELECT, "#citizenship", "Payee's Tax Information",
+                        payees=(NON_MIT,), doc="""
         Get or set the field 'Country of Citizenship' in the tax information
         section.
 
         Individual non-citizen payees only.
-        """
-        return self._select("#citizenship", val)
+        """)
 
     # Section: Mailing Instructions
-    def mail_check(self, val=None):
-        """
+    mail_check = Field(RADIO, "rfpDocument.mailToMit", "Mailing Instructions",
+                       payees=(NON_MIT,), values=("false", "true"), doc="""
         Get or set whether to 'Mail check to payee' (True) or 'Deliver check to
         MIT address' (False) in the mailing instructions section.
 
         Non-MIT payees only.
-        """
-        if val is None:
-            return self._radio("rfpDocument.mailToMit") == "false"
-        else:
-            val = "false" if val else "true"
-            self._radio("rfpDocument.mailToMit", val)
+        """)
 
-    def hold_check(self, val=None):
-        """
+    hold_check = Field(CHECKBOX, "#holdCheck", "Mailing Instructions",
+                       payees=(NON_MIT,), doc="""
         Get or set whether to 'Hold check for pickup at Accounts Payable
         office' in the mailing instructions section. This option is only
         available if :meth:`mail_check` is False.
 
         Non-MIT payees only.
-        """
-        return self._checkbox("#holdCheck", val)
+        """)
 
-    def addressee(self, val=None):
-        """
+    addressee = Field(TEXTBOX, "#addressee", "Mailing Instructions",
+                      payees=(NON_MIT,), doc="""
         Get or set the field 'Name' in the mailing instructions section under
         'Deliver check to MIT address'. Applies to both interdepartmental
         mail and holding for pickup.
 
         Non-MIT payees only.
-        """
-        return self._textbox("#addressee", val)
+        """)
 
-    def building_room(self, val=None):
-        """
+    building_room = Field(TEXTBOX, "#bldg-rm", "Mailing Instructions",
+                          payees=(NON_MIT,), doc="""
         Get or set the field 'Building-Room' in the mailing instructions section
         under 'Deliver check to MIT address'.
 
         Non-MIT payees using interdepartmental mail for delivery, only.
-        """
-        return self._textbox("#bldg-rm", val)
+        """)
 
-    def phone(self, val=None):
-        """
+    # Technically, this is the same field as 'building_room', above.
+    phone = Field(TEXTBOX, "#bldg-rm", "Mailing Instructions",
+                  payees=(NON_MIT,), doc="""
         Get or set the field 'Phone' in the mailing instructions section under
         'Deliver check to MIT address'.
 
         Non-MIT payees holding the check for pickup, only.
-        """
-        # Technically, this is the same field as 'building_room', above.
-        return self._textbox("#bldg-rm", val)
+        """)
 
     # Section: Line Items
     def line_item_count(self):
         """
         Get the number of line items displayed.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        return len(browsermulticss(".lineItem"))
+        dommulticss = self.dom.css_all
+        return len(dommulticss(".lineItem"))
 
     def date_of_service(self, li, val=None):
         """
@@ -777,22 +1477,35 @@ class RequestRfpPage(BasePage):
         """
         Click the 'Add Line' button. Does not cause a page reload.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss("#addLine").click()
+        domcss = self.dom.css
+        domcss("#addLine").click()
 
-    def office_note(self, val=None):
+    def set_line_items(self, items):
         """
-        Get or set the field 'Note to Central Office'.
+        Replace all line items with `items`, a list of tuples of
+        (date_of_service, gl_account, cost_object, amount, explanation). Lines
+        are added as needed and every field is filled in a single script call.
+        Lines beyond the end of `items` are cleared, since SAPweb has no
+        control to remove a line once it is added.
         """
-        return self._textbox("#messageForAP", val)
+        values = [["%s" % (val,) for val in item] for item in items]
+        self.dom.execute(self._SET_LINE_ITEMS_JS, values)
+        if self.line_item_count() < len(values):
+            raise FailedTransitionError("Line items could not be added.")
+
+    office_note = Field(TEXTBOX, "#messageForAP", "Note to Central Office",
+                        doc="""
+        Get or set the field 'Note to Central Office'.
+        """)
 
     def save(self):
         """
         Click the 'Save & Continue' button. Return an instance of
         :class:`AttachReceiptPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".saveAction").click()
+        domcss = self.dom.css
+        with self._transition("RequestRfpPage.save"):
+            domcss(".saveAction").click()
         self._pre_transition()
         return AttachReceiptPage(self.browser)
 
@@ -803,39 +1516,33 @@ class ViewAndEditPage(RequestRfpPage):
     help_urls = ["http://insidemit.mit.edu/help-apps/rfp_reimbursement.shtml",
                  "http://insidemit.mit.edu/help-apps/rfp_payment.shtml"]
 
-    def rfp_number(self):
-        """
+    rfp_number = Field(DATALIST, "RFP Number", "Payment Details", doc="""
         Get the field 'RFP Number' in the payment details section.
-        """
-        return self._datalist("RFP Number")
+        """)
 
-    def payee(self):
-        """
+    payee = Field(DATALIST, "Payee", "Payment Details", doc="""
         Get the field 'Payee' in the payment details section.
-        """
-        return self._datalist("Payee")
+        """)
 
-    def charge_to(self):
-        """
+    charge_to = Field(DATALIST, "Charge to", "Payment Details", doc="""
         Get the field 'Charge to' in the payment details section.
-        """
-        return self._datalist("Charge to")
+        """)
 
-    def ssn_tin(self):
-        """
+    ssn_tin = Field(DATALIST, "SSN/TIN", "Payee's Tax Information",
+                    payees=(NON_MIT,), doc="""
         Get the field 'SSN/TIN' in the tax information section.
 
         Non-MIT payees only.
-        """
-        return self._datalist("SSN/TIN")
+        """)
 
     def attach_receipt(self):
         """
         Click 'Attach Receipt'. Return an instance of
         :class:`AttachReceiptPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".attachReceipts").click()
+        domcss = self.dom.css
+        with self._transition("ViewAndEditPage.attach_receipt"):
+            domcss(".attachReceipts").click()
         # Do not perform checking because errors on this page will persist.
         return AttachReceiptPage(self.browser)
 
@@ -843,15 +1550,17 @@ class ViewAndEditPage(RequestRfpPage):
         """
         Click 'Save'. The page refreshes, but this object is still valid.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".saveAction").click()
+        domcss = self.dom.css
+        with self._transition("ViewAndEditPage.save"):
+            domcss(".saveAction").click()
 
     def send_to(self):
         """
         Click 'Send to'. Return an instance of :class:`SendToPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".sendToAction").click()
+        domcss = self.dom.css
+        with self._transition("ViewAndEditPage.send_to"):
+            domcss(".sendToAction").click()
         self._pre_transition()
         return SendToPage(self.browser)
 
@@ -864,128 +1573,100 @@ class ViewOnlyPage(BasePage):
                  "http://insidemit.mit.edu/help-apps/rfp_payment.shtml"]
 
     # Section: Current Status
-    def inbox(self):
-        """
+    inbox = Field(DATALIST, "Inbox", "Current Status", optional=True, doc="""
         Get the field 'Inbox' in the current status section if shown, else
         return None.
-        """
-        return self._try_datalist("Inbox")
+        """)
 
     # Section: Payment Details
-    def rfp_number(self):
-        """
+    rfp_number = Field(DATALIST, "RFP Number", "Payment Details", doc="""
         Get the field 'RFP Number' in the payment details section .
-        """
-        return self._datalist("RFP Number")
+        """)
 
-    def payee(self):
-        """
+    payee = Field(DATALIST, "Payee", "Payment Details", doc="""
         Get the field 'Payee' in the payment details section.
-        """
-        return self._datalist("Payee")
+        """)
 
-    def company_code(self):
-        """
+    company_code = Field(DATALIST, "Company Code", "Payment Details", doc="""
         Get the field 'Company Code' (a.k.a. 'Charge to') in the payment details
         section.
-        """
-        return self._datalist("Company Code")
+        """)
 
-    def rfp_name(self):
-        """
+    rfp_name = Field(DATALIST, "Name of RFP", "Payment Details", doc="""
         Get the field 'Name of RFP' in the payment details section.
-        """
-        return self._datalist("Name of RFP")
+        """)
 
-    def rfp_type(self):
-        """
+    rfp_type = Field(DATALIST, "Type of RFP", "Payment Details", doc="""
         Get the field 'Type of RFP' in the payment details section.
-        """
-        return self._datalist("Type of RFP")
+        """)
 
-    def payment_method(self):
-        """
+    payment_method = Field(DATALIST, "Payment Method", "Payment Details",
+                           doc="""
         Get the field 'Payment Method' in the payment details section.
-        """
-        return self._datalist("Payment Method")
+        """)
 
     # Section: Payee's Tax Information / Mailing Instructions
-    def mailing_instructions(self):
-        """
+    mailing_instructions = Field(
+        TEXT, "//h2[normalize-space(.)='Mailing Instructions']"
+              "/following-sibling::div[@class='sectionContainer'][1]//h4",
+        "Mailing Instructions", optional=True, doc="""
         Get the description of the mailing instructions in the mailing
         instructions section if shown, else None.
-        """
-        try:
-            browserxp = self.browser.find_element_by_xpath
-            xpath = "//h2[normalize-space(.)='Mailing Instructions']" + \
-                    "/following-sibling::div[@class='sectionContainer'][1]//h4"
-            return browserxp(xpath).text
-        except NoSuchElementException:
-            return None
+        """)
 
-    def addressee(self):
-        """
+    addressee = Field(DATALIST, "Name", "Mailing Instructions", optional=True,
+                      doc="""
         Get the field 'Name' in the mailing instructions section if shown,
         else None.
-        """
-        return self._try_datalist("Name")
+        """)
 
-    def phone(self):
-        """
+    phone = Field(DATALIST, "Phone", "Mailing Instructions", optional=True,
+                  doc="""
         Get the field 'Phone' in the mailing instructions section if shown,
         else None.
-        """
-        return self._try_datalist("Phone")
+        """)
 
-    def address(self):
-        """
+    address = Field(DATALIST, "Address", "Permanent Address", optional=True,
+                    doc="""
         Get the field 'Address' if shown, else None.
-        """
-        return self._try_datalist("Address")
+        """)
 
-    def city(self):
-        """
+    city = Field(DATALIST, "City", "Permanent Address", optional=True, doc="""
         Get the field 'City' if shown, else None.
-        """
-        return self._try_datalist("City")
+        """)
 
-    def state(self):
-        """
+    state = Field(DATALIST, "State/Region", "Permanent Address",
+                  optional=True, doc="""
         Get the field 'State/Region' if shown, else None.
-        """
-        return self._try_datalist("State/Region")
+        """)
 
-    def postal_code(self):
-        """
+    postal_code = Field(DATALIST, "Postal Code", "Permanent Address",
+                        optional=True, doc="""
         Get the field 'Postal Code' if shown, else None.
-        """
-        return self._try_datalist("Postal Code")
+        """)
 
-    def country(self):
-        """
+    country = Field(DATALIST, "Country", "Permanent Address", optional=True,
+                    doc="""
         Get the field 'Country' if shown, else None.
-        """
-        return self._try_datalist("Country")
+        """)
 
-    def tax_type(self):
-        """
+    tax_type = Field(DATALIST, "Tax Entity Type", "Payee's Tax Information",
+                     optional=True, doc="""
         Get the field 'Tax Entity Type' if shown, else None.
-        """
-        return self._try_datalist("Tax Entity Type")
+        """)
 
-    def ssn_tin(self):
-        """
+    ssn_tin = Field(DATALIST, "SSN/TIN", "Payee's Tax Information",
+                    optional=True, doc="""
         Get the field 'SSN/TIN' if shown, else None.
-        """
-        return self._try_datalist("SSN/TIN")
+        """)
 
     # Section: Line Items
     def line_item_count(self):
         """
         Get the number of line items displayed.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        return len(browsermulticss(".lineItem"))
+        dommulticss = self.dom.css_all
+        return len(dommulticss(".lineItem"))
 
     def date_of_service(self, li):
         """
@@ -1016,40 +1697,35 @@ class ViewOnlyPage(BasePage):
         """
         Get the field 'Explanation' for the specified line item.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        lidiv = browsermulticss(".lineItem")[li]
-        lidivcss = lidiv.find_element_by_css_selector
+        dommulticss = self.dom.css_all
+        lidiv = dommulticss(".lineItem")[li]
+        lidivcss = lidiv.css
         return lidivcss("div.data.indent1").text
 
     def _line_item_cells(self, li):
         """
         Get an ordered list of cells across the row of a line item.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        lidiv = browsermulticss(".lineItem")[li]
-        lidivmulticss = lidiv.find_elements_by_css_selector
+        dommulticss = self.dom.css_all
+        lidiv = dommulticss(".lineItem")[li]
+        lidivmulticss = lidiv.css_all
         return lidivmulticss("td")
 
-    def office_note(self):
-        """
+    office_note = Field(
+        TEXT, "//h3[normalize-space(.)='Note to Central Office']/"
+              "following-sibling::div[@class='sectionContainer'][1]",
+        "Note to Central Office", optional=True, doc="""
         Get the field 'Note to Central Office', else return None.
-        """
-        try:
-            browserxp = self.browser.find_element_by_xpath
-            xpath = "//h3[normalize-space(.)='Note to Central Office']/" + \
-                    "following-sibling::div[@class='sectionContainer'][1]"
-            return browserxp(xpath).text
-        except NoSuchElementException:
-            return None
-
+        """)
 
     def attach_receipt(self):
         """
         Click 'Attach Receipt'. Return an instance of
         :class:`AttachReceiptPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".attachReceipts").click()
+        domcss = self.dom.css
+        with self._transition("ViewOnlyPage.attach_receipt"):
+            domcss(".attachReceipts").click()
         # Do not perform checking because errors on this page will persist.
         return AttachReceiptPage(self.browser)
 
@@ -1057,18 +1733,25 @@ class ViewOnlyPage(BasePage):
         """
         Get the section 'RFP History' as a list of tuples: (date, time, action).
         """
-        browsercss = self.browser.find_elements_by_css_selector
-        historydiv = browsercss(".topHeadersTable")[-1]
-        historydivmulticss = historydiv.find_elements_by_css_selector
-        cells = historydivmulticss("td")
+        dommulticss = self.dom.css_all
+        historydiv = dommulticss(".topHeadersTable")[-1]
+        cells = historydiv.texts("td")
         result = list()
         for i in range(0, len(cells), 3):
-            date = cells[i].text
-            time = cells[i+1].text
-            action = cells[i+2].text
+            date = cells[i]
+            time = cells[i+1]
+            action = cells[i+2]
             result.append((date, time, action))
         return result
 
+    @_memoized
+    def history_events(self):
+        """
+        Get the section 'RFP History' as a list of
+        :class:`history.HistoryEvent`, oldest first.
+        """
+        return history.parse_history(self.history())
+
 class AttachReceiptPage(BasePage):
     """
     The receipt upload overlay; treated as a separate page. Not an entry page.
@@ -1077,16 +1760,22 @@ class AttachReceiptPage(BasePage):
 
     def __init__(self, browser):
         super(AttachReceiptPage, self).__init__(browser)
-        browsercss = self.browser.find_element_by_css_selector
-        if not browsercss("#doUpload").is_displayed():
+        domcss = self.dom.css
+        if not domcss("#doUpload").is_displayed():
             raise FailedTransitionError("Attachment popup is not shown.")
 
+    def rfp_number(self):
+        """
+        Get the field 'RFP Number' of the RFP behind the overlay.
+        """
+        return self._datalist("RFP Number")
+
     def select_file(self, path):
         """
         Browse to the given path for a file to upload.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss("#upload").send_keys(path)
+        domcss = self.dom.css
+        domcss("#upload").send_keys(path)
 
     def cancel(self):
         """
@@ -1107,11 +1796,12 @@ class AttachReceiptPage(BasePage):
         Click the button in the .ui-dialog overlay with the given text
         displayed. Return an instance of :class:`ViewAndEditPage`.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        buttons = browsermulticss(".ui-dialog button")
+        dommulticss = self.dom.css_all
+        buttons = dommulticss(".ui-dialog button")
         for button in buttons:
             if button.text == text:
-                button.click()
+                with self._transition("AttachReceiptPage.%s" % text.lower()):
+                    button.click()
                 break
         else:
             raise NoSuchElementException("Cancel button not found.")
@@ -1119,7 +1809,7 @@ class AttachReceiptPage(BasePage):
         # if an error is raised, the page object would still be an
         # AttachReceiptPage. So, we will not check if the upload succeeded.
         # Here, the user is responsible for checking .errors()
-        if 'Display RFP' in self.browser.title:
+        if 'Display RFP' in self.dom.title:
             return ViewOnlyPage(self.browser)
         else:
             return ViewAndEditPage(self.browser)
@@ -1135,23 +1825,23 @@ class SendToPage(BasePage):
         Click the 'Return to RFP' link. Return an instance of
         :class:`ViewAndEditPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss("a[href='ReturnToRfp.action']").click()
+        domcss = self.dom.css
+        with self._transition("SendToPage.return_to_rfp"):
+            domcss("a[href='ReturnToRfp.action']").click()
         self._pre_transition()
         return ViewAndEditPage(self.browser)
 
-    def recipient_name(self, val=None):
-        """
+    recipient_name = Field(TEXTBOX, "#recipientName", "Send To", doc="""
         Get or set the field 'Recipient's Name'.
-        """
-        return self._textbox("#recipientName", val)
+        """)
 
     def search(self):
         """
         Click the 'Search' button. Results load in the same page.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".searchForRecipient").click()
+        domcss = self.dom.css
+        with self._transition("SendToPage.search"):
+            domcss(".searchForRecipient").click()
 
     def results(self, index=None):
         """
@@ -1164,25 +1854,25 @@ class SendToPage(BasePage):
         If index is not None: select a search result, treating `index` as
         specifying a result by its zero-indexed position in the list.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        results = browsermulticss("td.data label[for^='addressee-']")
+        dommulticss = self.dom.css_all
+        results = dommulticss("td.data label[for^='addressee-']")
         if index is None:
             return [result.text.strip() for result in results]
         else:
-            results[index].click()
+            with self._transition("SendToPage.results"):
+                results[index].click()
 
-    def note(self, val=None):
-        """
+    note = Field(TEXTBOX, "#recipientNote", "Send To", doc="""
         Get or set the field 'Note to Recipient'.
-        """
-        return self._textbox("#recipientNote", val)
+        """)
 
     def send(self):
         """
         Click the 'Send' button. Return an instance of :class:`ViewOnlyPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss(".sendToAction").click()
+        domcss = self.dom.css
+        with self._transition("SendToPage.send"):
+            domcss(".sendToAction").click()
         self._pre_transition()
         return ViewOnlyPage(self.browser)
 
@@ -1193,63 +1883,61 @@ class SearchPage(BasePage):
     entry_url = "https://insidemit-apps.mit.edu/apps/rfp/SearchEntry.action?sapSystemId=PS1"
     help_url = "http://insidemit.mit.edu/help-apps/rfp_search.shtml"
 
+    parked = Field(CHECKBOX, "#parked", "RFP Types", doc="""
+        Get or set whether 'Parked' is checked under 'RFP Types'.
+        """)
+
+    posted = Field(CHECKBOX, "#posted", "RFP Types", doc="""
+        Get or set whether 'Posted' is checked under 'RFP Types'.
+        """)
+
+    deleted = Field(CHECKBOX, "#deleted", "RFP Types", doc="""
+        Get or set whether 'Deleted' is checked under 'RFP Types'.
+        """)
+
     def rfp_types(self, parked=None, posted=None, deleted=None):
         """
         Get or set the field 'RFP Types', represented as a tuple of booleans:
         (Parked, Posted, Deleted).
         """
-        Is_parked = self._checkbox("#parked", parked)
-        is_posted = self._checkbox("#posted", posted)
-        is_deleted = self._checkbox("#deleted", deleted)
+        is_parked = self.parked(parked)
+        is_posted = self.posted(posted)
+        is_deleted = self.deleted(deleted)
         return (is_parked, is_posted, is_deleted)
 
-    def company_code(self, val=None):
-        """
+    company_code = Field(SELECT, "#coCode", "Search Criteria", doc="""
         Get or set the field 'Company Code'.
-        """
-        return self._select("#coCode", val)
+        """)
 
-    def rfp_number(self, val=None):
-        """
+    rfp_number = Field(TEXTBOX, "#rfpNumber", "Search Criteria", doc="""
         Get or set the field 'RFP Number'.
-        """
-        return self._textbox("#rfpNumber", val)
+        """)
 
-    def creation_start(self, val=None):
-        """
+    creation_start = Field(TEXTBOX, "#creationStartDate", "Search Criteria",
+                           doc="""
         Get or set the start of the range 'Creation Date(s)'.
-        """
-        return self._textbox("#creationStartDate", val)
+        """)
 
-    def creation_end(self, val=None):
-        """
+    creation_end = Field(TEXTBOX, "#creationEndDate", "Search Criteria",
+                         doc="""
         Get or set the end of the range 'Creation Date(s)'.
-        """
-        return self._textbox("#creationEndDate", val)
+        """)
 
-    def payee(self, val=None):
-        """
+    payee = Field(TEXTBOX, "#payee", "Search Criteria", doc="""
         Get or set the field 'Payee'.
-        """
-        return self._textbox("#payee", val)
+        """)
 
-    def rfp_name(self, val=None):
-        """
+    rfp_name = Field(TEXTBOX, "#filingLabel", "Search Criteria", doc="""
         Get or set the field 'RFP Name'.
-        """
-        return self._textbox("#filingLabel", val)
+        """)
 
-    def cost_object(self, val=None):
-        """
+    cost_object = Field(TEXTBOX, "#costObject", "Search Criteria", doc="""
         Get or set the field 'Cost Object #'.
-        """
-        return self._textbox("#costObject", val)
+        """)
 
-    def gl_account(self, val=None):
-        """
+    gl_account = Field(TEXTBOX, "#glAccount", "Search Criteria", doc="""
         Get or set the field 'G/L Account #'.
-        """
-        return self._textbox("#glAccount", val)
+        """)
 
     def search(self):
         """
@@ -1257,10 +1945,11 @@ class SearchPage(BasePage):
         instance of :class:`SearchPage` listing the results; otherwise, return
         an instance of :class:`ViewOnlyPage`.
         """
-        browsercss = self.browser.find_element_by_css_selector
-        browsercss("#searchButton").click()
+        domcss = self.dom.css
+        with self._transition("SearchPage.search"):
+            domcss("#searchButton").click()
         self._pre_transition()
-        if "Display RFP" in self.browser.title:
+        if "Display RFP" in self.dom.title:
             return ViewOnlyPage(self.browser)
         else:
             return self
@@ -1279,15 +1968,35 @@ class SearchPage(BasePage):
         Note: RFP number displayed on this page may contain a leading zero not
         shown elsewhere.
         """
-        browsermulticss = self.browser.find_elements_by_css_selector
-        results = browsermulticss("td.data a[href^='SearchDrillDown']")
+        dommulticss = self.dom.css_all
+        results = dommulticss("td.data a[href^='SearchDrillDown']")
         if index is None:
             return [result.text.strip() for result in results]
         else:
-            results[index].click()
+            with self._transition("SearchPage.results"):
+                results[index].click()
             self._pre_transition()
             return ViewOnlyPage(self.browser)
 
+    @_memoized
+    def result_table(self):
+        """
+        Get every search result as a dictionary with the keys rfp_number,
+        creation_date, payee, created_by, rfp_name, location_status,
+        cost_object and amount, in the order shown. The page is fetched once
+        and parsed locally, rather than queried cell by cell.
+
+        Note: as in :meth:`results`, RFP numbers are shown as displayed.
+        """
+        keys = ("rfp_number", "creation_date", "payee", "created_by",
+                "rfp_name", "location_status", "cost_object", "amount")
+        snapshot = self.dom.snapshot()
+        table = []
+        for link in snapshot.css_all("td.data a[href^='SearchDrillDown']"):
+            cells = [cell.text for cell in link.xpath_all("../../td")]
+            table.append(dict(zip(keys, cells)))
+        return table
+
     def result_creation_date(self, rfp):
         """
         Get the field 'Creation Date' for the specified RFP.
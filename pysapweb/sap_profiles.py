@@ -3,19 +3,47 @@
     ~~~~~~~~~~~~
 
     The `sap_profiles` module includes utility methods to create and load
-    Selenium browser profiles configured for use with SAPweb.
+    Selenium browser profiles configured for use with SAPweb, either in a
+    local Firefox or through WebDriver servers that may run on other hosts.
+
+    Selenium is only imported by the functions that start a browser, so
+    that tools which only read stored pages do not need it.
 """
 
+import itertools
 import os
 import shutil
 import sys
-
-from selenium import webdriver
+import threading
 
 DEFAULT_PROFILE = os.path.join("~", ".pysapwebprofile")
 CA_URL = "https://ca.mit.edu/"
 EXTENSION_URL = "https://addons.mozilla.org/en-us/firefox/addon/startupmaster/"
 
+# Preferences applied on top of the saved profile in lean mode. Stylesheets and
+# scripts are left alone: the `rfp` page objects rely on jQuery to render line
+# items and overlays, and on CSS to decide whether the upload popup is shown.
+LEAN_PREFERENCES = {
+    # don't download images or web fonts
+    "permissions.default.image": 2,
+    "browser.display.use_document_fonts": 0,
+    "gfx.downloadable_fonts.enabled": False,
+    # no prefetching or speculative connections
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "network.http.speculative-parallel-limit": 0,
+    "browser.urlbar.speculativeConnect.enabled": False,
+    # refuse third-party cookies, trackers and plugins
+    "network.cookie.cookieBehavior": 1,
+    "privacy.trackingprotection.enabled": True,
+    "plugin.state.flash": 0,
+    "media.autoplay.enabled": False,
+    # keep memory use down between page loads
+    "browser.cache.disk.enable": False,
+    "browser.sessionhistory.max_total_viewers": 0,
+    "browser.sessionstore.resume_from_crash": False,
+}
+
 def create_firefox_profile(profile_dir=DEFAULT_PROFILE, overwrite=False):
     """
     Guide the user through setting up a Firefox profile for use with pysapweb.
@@ -31,6 +59,7 @@ def create_firefox_profile(profile_dir=DEFAULT_PROFILE, overwrite=False):
         else:
             raise OSError("Profile directory %s already exists." % profile_dir)
 
+    from selenium import webdriver
     profile = webdriver.FirefoxProfile()
     profile.accept_untrusted_certs = False
     profile.set_preference("security.default_personal_cert",
@@ -69,12 +98,165 @@ def create_firefox_profile(profile_dir=DEFAULT_PROFILE, overwrite=False):
                                "fxdriver@googlecode.com"))
     print "    - Profile created successfully!"
 
-def load_firefox(profile_dir=DEFAULT_PROFILE):
-    """Return a WebDriver instance with the given Firefox profile loaded."""
-    profile_dir = os.path.expanduser(profile_dir)
-    profile = webdriver.FirefoxProfile(profile_dir)
-    browser = webdriver.Firefox(profile)
+def load_firefox(profile_dir=DEFAULT_PROFILE, lean=False, headless=None):
+    """
+    Return a WebDriver instance with the given Firefox profile loaded.
+
+    If `lean` is True, the preferences in :data:`LEAN_PREFERENCES` are
+    applied to the session, so images, web fonts, prefetching and
+    third-party content are not loaded, and by default Firefox runs
+    headless. The profile on disk is not modified.
+
+    A headless Firefox cannot show the master password prompt that profiles
+    made by :func:`create_firefox_profile` ask for at startup, so it would
+    wait for it forever. Lean mode therefore needs a profile without a
+    master password, unless `headless` is False.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.firefox.firefox_binary import FirefoxBinary
+    profile = _load_profile(profile_dir, lean)
+    binary = None
+    if lean if headless is None else headless:
+        binary = FirefoxBinary()
+        binary.add_command_line_options("-headless")
+    browser = webdriver.Firefox(profile, binary)
     return browser
 
+def connect_firefox(url, profile_dir=DEFAULT_PROFILE, lean=False,
+                    keep_alive=True, headless=None):
+    """
+    Return a WebDriver instance for a new Firefox session on the WebDriver
+    server at `url`: a geckodriver or Selenium standalone server, or a grid
+    hub, e.g. 'http://127.0.0.1:4444/wd/hub'. The profile is sent to the
+    server, so it need not exist on the server's host. `lean` and `headless`
+    are as in :func:`load_firefox`.
+
+    If `keep_alive` is True, commands are sent over a persistent HTTP
+    connection rather than a new one each.
+    """
+    from selenium import webdriver
+    options = webdriver.FirefoxOptions()
+    options.profile = _load_profile(profile_dir, lean)
+    if lean if headless is None else headless:
+        options.add_argument("-headless")
+    return webdriver.Remote(command_executor=url, options=options,
+                            keep_alive=keep_alive)
+
+def release_session(browser, timeout=30):
+    """
+    Ask the WebDriver server behind `browser` to delete its session, over a
+    connection of its own, so that this works even while a command on the
+    session is blocked. The request is sent in the background and any error
+    is ignored. Does nothing for a browser without a session.
+    """
+    url = getattr(getattr(browser, "command_executor", None), "_url", None)
+    session_id = getattr(browser, "session_id", None)
+    if not url or not session_id:
+        return
+    import urllib2
+    request = urllib2.Request("%s/session/%s" % (url.rstrip("/"), session_id))
+    request.get_method = lambda: "DELETE"
+    def delete():
+        try:
+            urllib2.urlopen(request, timeout=timeout).close()
+        except Exception:
+            pass
+    thread = threading.Thread(target=delete)
+    thread.daemon = True
+    thread.start()
+
+def _load_profile(profile_dir, lean):
+    from selenium import webdriver
+    profile = webdriver.FirefoxProfile(os.path.expanduser(profile_dir))
+    if lean:
+        for key, value in LEAN_PREFERENCES.items():
+            profile.set_preference(key, value)
+    return profile
+
+class RemoteEndpoints(object):
+    """
+    Starts sessions on several WebDriver servers, each time on the server
+    with the fewest open sessions. An instance can be used wherever a browser
+    factory is expected, such as :class:`pool.BrowserPool`::
+
+        endpoints = RemoteEndpoints(["http://10.0.0.5:4444/wd/hub",
+                                     "http://10.0.0.6:4444/wd/hub"])
+        pool = BrowserPool(endpoints, size=8)
+
+    :param urls: URLs of the WebDriver servers
+    :param profile_dir: Firefox profile to send with every session
+    :param lean: as in :func:`load_firefox`
+    :param max_sessions: most sessions to open on one server, or None
+    :param keep_alive: as in :func:`connect_firefox`
+    """
+    def __init__(self, urls, profile_dir=DEFAULT_PROFILE, lean=False,
+                 max_sessions=None, keep_alive=True):
+        self.urls = list(urls)
+        self.profile_dir = profile_dir
+        self.lean = lean
+        self.max_sessions = max_sessions
+        self.keep_alive = keep_alive
+        self.sessions = dict.fromkeys(self.urls, 0)
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        return self.connect()
+
+    def connect(self):
+        """
+        Start a session on the least busy server and return its WebDriver
+        instance. Servers that fail to start a session are skipped; the last
+        error is raised if every server fails or is full.
+        """
+        tried = set()
+        error = RuntimeError("Every WebDriver server is full.")
+        while True:
+            with self._lock:
+                # rotate the starting point so ties are spread evenly
+                start = next(self._turn) % len(self.urls)
+                candidates = [url for url in
+                              self.urls[start:] + self.urls[:start]
+                              if url not in tried and
+                              (self.max_sessions is None or
+                               self.sessions[url] < self.max_sessions)]
+                if not candidates:
+                    raise error
+                url = min(candidates, key=lambda url: self.sessions[url])
+                self.sessions[url] += 1
+            tried.add(url)
+            try:
+                browser = connect_firefox(url, self.profile_dir, self.lean,
+                                          self.keep_alive)
+            except Exception as e:
+                error = e
+                with self._lock:
+                    self.sessions[url] -= 1
+                continue
+            self._track(browser, url)
+            return browser
+
+    def _track(self, browser, url):
+        """
+        Make quitting `browser` free its place on `url`, once, however the
+        quit ends. If it fails, the session is deleted on the server instead.
+        """
+        quit = browser.quit
+        released = []
+        def tracked_quit():
+            try:
+                quit()
+            except Exception:
+                if not released:
+                    release_session(browser)
+                raise
+            finally:
+                with self._lock:
+                    if not released:
+                        released.append(True)
+                        self.sessions[url] -= 1
+        browser.quit = tracked_quit
+        browser.endpoint = url
+
 if __name__ == "__main__":
     create_firefox_profile()
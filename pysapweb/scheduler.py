@@ -0,0 +1,209 @@
+"""
+    scheduler
+    ~~~~~~~~~
+
+    The `scheduler` module spreads RFP work over several SAPweb accounts,
+    each with its own Firefox profile (see
+    :func:`sap_profiles.create_firefox_profile`), browser pool and
+    concurrency limit::
+
+        scheduler = Scheduler([
+            Account("dept", "~/.sapweb/dept", concurrency=2,
+                    cost_objects=["6666666"]),
+            Account("lab", "~/.sapweb/lab", company_codes=["CUR"]),
+        ])
+        job = scheduler.submit(rfp.view, args=("123",), cost_object="6666666")
+        details = job.result()
+        scheduler.shutdown()
+
+    A job is routed to the accounts that may handle it: the named account if
+    one is given, else the accounts that list its cost object, else those
+    that list its company code, else those that list neither. Among those,
+    it goes to the account with the least work per browser.
+"""
+
+import Queue
+import threading
+
+from pysapweb import sap_profiles, watchdog
+from pysapweb.pool import BrowserPool
+
+class Account(object):
+    """
+    A delegated SAPweb account.
+
+    :param name: name used to refer to the account
+    :param profile_dir: Firefox profile logged in to the account
+    :param concurrency: number of browsers to run for the account at once
+    :param company_codes: company codes the account may file under
+    :param cost_objects: cost objects the account may charge
+    :param factory: callable returning a WebDriver instance; by default the
+        profile is loaded with :func:`sap_profiles.load_firefox` and watched
+        by :mod:`watchdog` with `watch_options`. Browsers watched by
+        :mod:`watchdog` are replaced when they need recycling.
+    :param lean: passed on to :func:`sap_profiles.load_firefox`
+    :param watch_options: keyword arguments of :func:`watchdog.watch` for
+        the default factory
+    """
+    def __init__(self, name, profile_dir=sap_profiles.DEFAULT_PROFILE,
+                 concurrency=1, company_codes=(), cost_objects=(),
+                 factory=None, lean=False, watch_options=None):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.concurrency = concurrency
+        self.company_codes = set(company_codes)
+        self.cost_objects = set(cost_objects)
+        if factory is None:
+            factory = watchdog.supervise(
+                lambda: sap_profiles.load_firefox(profile_dir, lean),
+                **(watch_options or {}))
+        self.pool = BrowserPool(factory, concurrency, watchdog.retire)
+        self.pending = 0
+        self._queue = Queue.Queue()
+        self._workers = []
+
+    def __repr__(self):
+        return "Account(%r)" % (self.name,)
+
+class Job(object):
+    """
+    A unit of work submitted to a :class:`Scheduler`.
+    """
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.account = None
+        self._result = None
+        self._exception = None
+        self._done = threading.Event()
+
+    def done(self):
+        """
+        Return True if the job has finished.
+        """
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for the job to finish and return the value `func` returned, or
+        raise the exception it raised.
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError("Job did not finish in time.")
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def _run(self, browser):
+        try:
+            self._result = self.func(browser, *self.args, **self.kwargs)
+        except Exception as e:
+            self._exception = e
+        finally:
+            self._done.set()
+
+class Scheduler(object):
+    """
+    Runs jobs on a set of :class:`Account` objects. Each account has as many
+    worker threads as its concurrency limit, started on first use.
+    """
+    def __init__(self, accounts):
+        self.accounts = list(accounts)
+        self._lock = threading.Lock()
+
+    def submit(self, func, args=(), kwargs=None, account=None,
+               company_code=None, cost_object=None):
+        """
+        Queue `func(browser, *args, **kwargs)` on the least loaded account
+        allowed to handle it, and return a :class:`Job`.
+
+        :param account: name of the account to use
+        :param company_code: company code the work is filed under
+        :param cost_object: cost object the work charges
+        """
+        job = Job(func, args, kwargs or {})
+        with self._lock:
+            candidates = self.route(account, company_code, cost_object)
+            chosen = min(candidates,
+                         key=lambda a: float(a.pending) / a.concurrency)
+            chosen.pending += 1
+            job.account = chosen
+            self._start(chosen)
+        chosen._queue.put(job)
+        return job
+
+    def route(self, account=None, company_code=None, cost_object=None):
+        """
+        Return the accounts allowed to handle a job with the given routing
+        keys. Raise ValueError if there are none.
+        """
+        if account is not None:
+            candidates = [a for a in self.accounts if a.name == account]
+        elif cost_object and any(cost_object in a.cost_objects
+                                 for a in self.accounts):
+            candidates = [a for a in self.accounts
+                          if cost_object in a.cost_objects]
+        elif company_code and any(company_code in a.company_codes
+                                  for a in self.accounts):
+            candidates = [a for a in self.accounts
+                          if company_code in a.company_codes]
+        else:
+            candidates = [a for a in self.accounts
+                          if not a.cost_objects and not a.company_codes]
+        if not candidates:
+            raise ValueError("No account can handle account=%r, "
+                             "company_code=%r, cost_object=%r." %
+                             (account, company_code, cost_object))
+        return candidates
+
+    def map(self, func, items, key=None):
+        """
+        Submit `func(browser, item)` for every item and return the results in
+        order. `key`, if given, maps an item to a dictionary of routing
+        keywords for :meth:`submit`.
+        """
+        jobs = [self.submit(func, (item,), **(key(item) if key else {}))
+                for item in items]
+        return [job.result() for job in jobs]
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker threads once their queues are empty, and quit every
+        browser.
+        """
+        with self._lock:
+            workers = []
+            for account in self.accounts:
+                for worker in account._workers:
+                    account._queue.put(None)
+                workers.extend(account._workers)
+                account._workers = []
+        if wait:
+            for worker in workers:
+                worker.join()
+        for account in self.accounts:
+            account.pool.close()
+
+    def _start(self, account):
+        while len(account._workers) < account.concurrency:
+            worker = threading.Thread(target=self._work, args=(account,))
+            worker.daemon = True
+            worker.start()
+            account._workers.append(worker)
+
+    def _work(self, account):
+        while True:
+            job = account._queue.get()
+            if job is None:
+                return
+            try:
+                with account.pool.browser() as browser:
+                    job._run(browser)
+            except Exception as e:
+                # the browser could not be started
+                job._exception = e
+                job._done.set()
+            finally:
+                with self._lock:
+                    account.pending -= 1
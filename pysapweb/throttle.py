@@ -0,0 +1,188 @@
+"""
+    throttle
+    ~~~~~~~~
+
+    The `throttle` module limits the rate and concurrency of requests to
+    SAPweb. Every page navigation and action click made by the `rfp` module
+    goes through the installed limiter; none is installed by default::
+
+        throttle.set_limiter(throttle.Limiter(rate=2, burst=4, concurrency=3))
+
+    The limiter is a token bucket: `burst` requests may be made at once, then
+    `rate` per second. The rate adapts to the server: it is halved whenever a
+    request fails, lands on an error page or takes longer than `slow` seconds,
+    and grows back a little after each request that goes well.
+
+    A limiter created with `shared=True` keeps its state in shared memory, so
+    it also limits processes started with :mod:`multiprocessing` after it was
+    created and installed.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+#: Titles of pages SAPweb shows instead of the requested page when it is
+#: failing or overloaded.
+ERROR_PAGE = re.compile(r"\b(error|unavailable|too many requests|timed? ?out|"
+                        r"bad gateway)\b", re.IGNORECASE)
+
+# layout of the limiter state
+_TOKENS, _LAST, _RATE, _COUNT, _ERRORS, _QUEUED, _QUEUED_MAX, _SERVICE, \
+    _SERVICE_MAX = range(9)
+
+class Limiter(object):
+    """
+    An adaptive token bucket, optionally with a limit on the number of
+    requests in flight.
+
+    :param rate: requests per second to start at and never exceed
+    :param burst: number of requests that may be made without waiting
+    :param concurrency: most requests in flight at once, or None
+    :param min_rate: rate below which backoff does not go
+    :param slow: seconds after which a request counts as slow
+    :param decrease: factor applied to the rate on an error or slow request
+    :param increase: requests per second added after a good request; by
+        default a tenth of `rate`
+    :param shared: keep state in shared memory, for use across processes
+    """
+    def __init__(self, rate=2.0, burst=4, concurrency=None, min_rate=0.1,
+                 slow=10.0, decrease=0.5, increase=None, shared=False):
+        self.max_rate = float(rate)
+        self.burst = burst
+        self.min_rate = min_rate
+        self.slow = slow
+        self.decrease = decrease
+        self.increase = self.max_rate / 10 if increase is None else increase
+        state = [burst, time.time(), self.max_rate, 0, 0, 0, 0, 0, 0]
+        if shared:
+            import multiprocessing
+            self._state = multiprocessing.Array("d", state)
+            self._lock = self._state.get_lock()
+            semaphore = multiprocessing.BoundedSemaphore
+        else:
+            self._state = state
+            self._lock = threading.Lock()
+            semaphore = threading.BoundedSemaphore
+        self._slots = semaphore(concurrency) if concurrency else None
+
+    @property
+    def rate(self):
+        """
+        The current rate, in requests per second.
+        """
+        return self._state[_RATE]
+
+    def acquire(self):
+        """
+        Wait until a request may be made. Return the number of seconds waited.
+        """
+        start = time.time()
+        while True:
+            with self._lock:
+                state = self._state
+                now = time.time()
+                tokens = min(self.burst, state[_TOKENS] +
+                             (now - state[_LAST]) * state[_RATE])
+                state[_LAST] = now
+                if tokens >= 1:
+                    state[_TOKENS] = tokens - 1
+                    return now - start
+                state[_TOKENS] = tokens
+                wait = (1 - tokens) / state[_RATE]
+            time.sleep(wait)
+
+    def report(self, queued, service, error=False):
+        """
+        Record a finished request and adapt the rate to how it went.
+        """
+        with self._lock:
+            state = self._state
+            state[_COUNT] += 1
+            state[_QUEUED] += queued
+            state[_QUEUED_MAX] = max(state[_QUEUED_MAX], queued)
+            state[_SERVICE] += service
+            state[_SERVICE_MAX] = max(state[_SERVICE_MAX], service)
+            if error or service > self.slow:
+                state[_ERRORS] += 1 if error else 0
+                state[_RATE] = max(self.min_rate,
+                                   state[_RATE] * self.decrease)
+            else:
+                state[_RATE] = min(self.max_rate,
+                                   state[_RATE] + self.increase)
+
+    @contextmanager
+    def request(self, document=None):
+        """
+        Wrap a request: wait for a concurrency slot and a token, run the
+        block, then report it. If `document` is given, its title is checked
+        against :data:`ERROR_PAGE` afterwards.
+        """
+        start = time.time()
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            self.acquire()
+            queued = time.time() - start
+            error = False
+            try:
+                yield
+                if document is not None and \
+                   ERROR_PAGE.search(document.title or ""):
+                    error = True
+            except Exception:
+                error = True
+                raise
+            finally:
+                self.report(queued, time.time() - start - queued, error)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def stats(self):
+        """
+        Return a dictionary with the number of requests and errors, the
+        current rate, and the total, mean and maximum seconds spent queued
+        and in service.
+        """
+        with self._lock:
+            state = list(self._state)
+        count = int(state[_COUNT])
+        return {"count": count,
+                "errors": int(state[_ERRORS]),
+                "rate": state[_RATE],
+                "queued_total": state[_QUEUED],
+                "queued_mean": state[_QUEUED] / count if count else None,
+                "queued_max": state[_QUEUED_MAX],
+                "service_total": state[_SERVICE],
+                "service_mean": state[_SERVICE] / count if count else None,
+                "service_max": state[_SERVICE_MAX]}
+
+_limiter = None
+
+def set_limiter(limiter):
+    """
+    Install `limiter` for all requests made by pysapweb, or remove the
+    installed one if `limiter` is None.
+    """
+    global _limiter
+    _limiter = limiter
+
+def get_limiter():
+    """
+    Return the installed limiter, or None.
+    """
+    return _limiter
+
+def request(document=None):
+    """
+    Wrap a request with the installed limiter. See :meth:`Limiter.request`.
+    """
+    if _limiter is None:
+        return _unlimited()
+    return _limiter.request(document)
+
+@contextmanager
+def _unlimited():
+    yield
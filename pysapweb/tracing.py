@@ -0,0 +1,131 @@
+"""
+    tracing
+    ~~~~~~~
+
+    The `tracing` module times the phases of the `rfp` convenience methods and
+    each page transition. Spans are discarded unless a sink is installed::
+
+        tracing.set_tracer(tracing.Tracer(tracing.JsonLinesSink("trace.jsonl")))
+
+    A sink is any callable that accepts a finished span as a dictionary with
+    the keys name, trace_id, span_id, parent_id, thread, start (seconds since
+    the epoch), duration (seconds), attributes and error.
+"""
+
+import binascii
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+class Span(object):
+    """
+    A timed operation. Attributes may be added while the span is open with
+    :meth:`set`.
+    """
+    def __init__(self, name, trace_id, span_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        """
+        Add or replace attributes of this span.
+        """
+        self.attributes.update(attributes)
+
+class _NullSpan(object):
+    def set(self, **attributes):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer(object):
+    """
+    Creates nested spans and hands each one to `sink` when it ends. Spans
+    opened on the same thread while another is open become its children.
+    """
+    def __init__(self, sink=None):
+        self.sink = sink
+        self._local = threading.local()
+
+    def _new_id(self):
+        return binascii.hexlify(os.urandom(8))
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block as a span with the given name and attributes.
+        Yield the :class:`Span`, so attributes known only later can be added.
+        """
+        if self.sink is None:
+            yield _NULL_SPAN
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        span = Span(name,
+                    parent.trace_id if parent else self._new_id(),
+                    self._new_id(),
+                    parent.span_id if parent else None,
+                    attributes)
+        stack.append(span)
+        error = None
+        start = time.time()
+        try:
+            yield span
+        except Exception as e:
+            error = "%s: %s" % (type(e).__name__, e)
+            raise
+        finally:
+            duration = time.time() - start
+            stack.pop()
+            self.sink({"name": span.name,
+                       "trace_id": span.trace_id,
+                       "span_id": span.span_id,
+                       "parent_id": span.parent_id,
+                       "thread": threading.current_thread().name,
+                       "start": start,
+                       "duration": duration,
+                       "attributes": span.attributes,
+                       "error": error})
+
+class JsonLinesSink(object):
+    """
+    Append each span to a file as one line of JSON. Safe to share between
+    threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+_tracer = Tracer()
+
+def set_tracer(tracer):
+    """
+    Install `tracer` for all spans created by pysapweb.
+    """
+    global _tracer
+    _tracer = tracer
+
+def get_tracer():
+    """
+    Return the installed tracer.
+    """
+    return _tracer
+
+def span(name, **attributes):
+    """
+    Open a span on the installed tracer. See :meth:`Tracer.span`.
+    """
+    return _tracer.span(name, **attributes)
@@ -0,0 +1,195 @@
+"""
+    validation
+    ~~~~~~~~~~
+
+    The `validation` module checks the arguments to :func:`rfp.create` before
+    any page is loaded, so that a bad row in a batch fails at once rather
+    than after the whole form has been filled in::
+
+        validator = validation.Validator("known.json")
+        rfp.create(browser, ..., validator=validator)
+
+    Besides checking the format of each field, a validator learns the cost
+    objects and G/L accounts used by RFPs that were saved successfully (and
+    any :func:`rfp.view` results it is given), and keeps them in a file. A
+    `strict` validator rejects values it has not seen before.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+from pysapweb.amounts import parse_cents
+
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y")
+GL_ACCOUNT = re.compile(r"^\d{6}$")
+COST_OBJECT = re.compile(r"^\d{7}$")
+
+#: Postal code formats by two-letter country code. Countries not listed are
+#: not checked.
+POSTAL_CODES = {
+    "US": re.compile(r"^\d{5}(-\d{4})?$"),
+    "CA": re.compile(r"^[A-Z]\d[A-Z] ?\d[A-Z]\d$", re.IGNORECASE),
+    "GB": re.compile(r"^[A-Z]{1,2}\d[A-Z\d]? ?\d[A-Z]{2}$", re.IGNORECASE),
+    "DE": re.compile(r"^\d{5}$"),
+    "FR": re.compile(r"^\d{5}$"),
+    "JP": re.compile(r"^\d{3}-?\d{4}$"),
+    "IN": re.compile(r"^\d{6}$"),
+    "CN": re.compile(r"^\d{6}$"),
+}
+
+#: Full country names accepted for the countries in :data:`POSTAL_CODES`.
+COUNTRY_CODES = {
+    "united states": "US", "united states of america": "US", "usa": "US",
+    "canada": "CA", "united kingdom": "GB", "germany": "DE", "france": "FR",
+    "japan": "JP", "india": "IN", "china": "CN",
+}
+
+#: Countries whose addresses must include a state or region.
+REQUIRES_STATE = ("US", "CA")
+
+class ValidationError(ValueError):
+    """
+    Raised when the arguments to :func:`rfp.create` are invalid. `problems`
+    is the list of every problem found.
+    """
+    def __init__(self, problems):
+        ValueError.__init__(self, "; ".join(problems))
+        self.problems = problems
+
+class Validator(object):
+    """
+    Checks RFP specifications. If `path` is given, known cost objects and G/L
+    accounts are loaded from that file if it exists, and saved to it by
+    :meth:`save`. If `strict` is True, values not yet known are rejected.
+    """
+    def __init__(self, path=None, strict=False):
+        self.path = path
+        self.strict = strict
+        self.cost_objects = set()
+        self.gl_accounts = set()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                known = json.load(f)
+            self.cost_objects.update(known.get("cost_objects", ()))
+            self.gl_accounts.update(known.get("gl_accounts", ()))
+
+    def check(self, name='', payee=None, address=None, line_items=(),
+              office_note='', receipts=(), send_to=None):
+        """
+        Return a list of problems with the given arguments to
+        :func:`rfp.create`, which is empty if there are none.
+        """
+        problems = []
+        if not payee or len(payee) != 2 or not payee[1]:
+            problems.append("payee must be a tuple of (is_mit, name)")
+        if address:
+            problems.extend(self._check_address(address))
+        if not line_items:
+            problems.append("at least one line item is required")
+        for i, item in enumerate(line_items):
+            problems.extend("line item %d: %s" % (i + 1, problem)
+                            for problem in self._check_line_item(item))
+        for receipt in receipts:
+            if not os.path.isfile(receipt):
+                problems.append("receipt %s does not exist" % (receipt,))
+        if send_to and (len(send_to) != 2 or not send_to[0]):
+            problems.append("send_to must be a tuple of (recipient, note)")
+        return problems
+
+    def validate(self, **kwargs):
+        """
+        Check the given arguments to :func:`rfp.create` as in :meth:`check`.
+        Raise :class:`ValidationError` if there are problems.
+        """
+        problems = self.check(**kwargs)
+        if problems:
+            raise ValidationError(problems)
+
+    def _check_address(self, address):
+        if len(address) == 5:
+            address_line, city, state, postal_code, country = address
+        elif len(address) == 4:
+            address_line, city, postal_code, country = address
+            state = None
+        else:
+            return ["address must have 4 or 5 parts"]
+        problems = []
+        if not address_line or not city:
+            problems.append("address line and city are required")
+        country = country or ""
+        code = COUNTRY_CODES.get(country.strip().lower(), country.upper())
+        if code in REQUIRES_STATE and not state:
+            problems.append("a state is required for %s" % (country,))
+        pattern = POSTAL_CODES.get(code)
+        if pattern is not None and not pattern.match(postal_code or ""):
+            problems.append("postal code %r is not valid for %s" %
+                            (postal_code, country))
+        return problems
+
+    def _check_line_item(self, item):
+        if len(item) != 5:
+            return ["must be a tuple of (date_of_service, gl_account, "
+                    "cost_object, amount, explanation)"]
+        date, gl_account, cost_object, amount, explanation = \
+            ["%s" % (val,) if val is not None else "" for val in item]
+        problems = []
+        if not _parse_date(date):
+            problems.append("date of service %r is not MM/DD/YYYY" % (date,))
+        if not GL_ACCOUNT.match(gl_account):
+            problems.append("G/L account %r is not 6 digits" % (gl_account,))
+        elif self.strict and gl_account not in self.gl_accounts:
+            problems.append("G/L account %s is not known" % (gl_account,))
+        if not COST_OBJECT.match(cost_object):
+            problems.append("cost object %r is not 7 digits" % (cost_object,))
+        elif self.strict and cost_object not in self.cost_objects:
+            problems.append("cost object %s is not known" % (cost_object,))
+        cents = parse_cents(amount)
+        if cents is None or cents <= 0:
+            problems.append("amount %r is not a positive amount" % (amount,))
+        if not explanation.strip():
+            problems.append("an explanation is required")
+        return problems
+
+    def learn(self, line_items):
+        """
+        Record the cost objects and G/L accounts in `line_items`, in the
+        format taken by :func:`rfp.create`, as known.
+        """
+        for item in line_items:
+            self.gl_accounts.add("%s" % (item[1],))
+            self.cost_objects.add("%s" % (item[2],))
+
+    def learn_details(self, details):
+        """
+        Record the cost objects and G/L accounts of an RFP, as returned by
+        :func:`rfp.view`, as known.
+        """
+        for li in details["line_items"]:
+            if li["gl_account"]:
+                self.gl_accounts.add(li["gl_account"])
+            if li["cost_object"]:
+                self.cost_objects.add(li["cost_object"])
+
+    def save(self):
+        """
+        Write the known values to `path`, if set, replacing the file
+        atomically.
+        """
+        if self.path is None:
+            return
+        known = {"cost_objects": sorted(self.cost_objects),
+                 "gl_accounts": sorted(self.gl_accounts)}
+        temp = self.path + ".tmp"
+        with open(temp, "w") as f:
+            json.dump(known, f)
+        os.rename(temp, self.path)
+
+def _parse_date(date):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(date.strip(), date_format)
+        except ValueError:
+            pass
+    return None
@@ -0,0 +1,232 @@
+"""
+    watch
+    ~~~~~
+
+    The `watch` module polls SAPweb for changes in the status of RFPs and
+    reports each change, instead of re-running :func:`rfp.view` from cron::
+
+        watcher = watch.Watcher(browser, rfp_numbers=["123", "124"],
+                                search={"cost_object": "6666666"},
+                                callback=notify)
+        watcher.run()
+
+    Each watched RFP is checked on its own schedule: soon after it last
+    changed, then less and less often while it stays the same. RFPs stop
+    being watched once they reach a terminal state (posted or deleted). RFPs
+    covered by the `search` filter are all checked with one search query.
+
+    Statuses are reported in one form however they were read: the name of
+    the inbox an RFP is in, 'posted' or 'deleted', or else the last action
+    taken on it, without the name of whoever took it.
+"""
+
+import threading
+import time
+
+from pysapweb import history, rfp
+
+#: Matches the statuses after which an RFP is no longer watched.
+TERMINAL = history._TERMINAL
+
+class Watcher(object):
+    """
+    Watches RFPs for status changes.
+
+    :param browser: WebDriver instance to use
+    :param rfp_numbers: RFPs to check individually
+    :param search: dictionary of :class:`rfp.SearchPage` fields (e.g.
+        `cost_object`, `creation_start`) whose results are checked together
+    :param callback: called as `callback(rfp_number, old, new)` on every
+        change; `old` is None the first time an RFP is seen
+    :param queue: if given, each change is also put on it as a tuple
+    :param min_interval: seconds between checks right after a change
+    :param max_interval: longest time between checks, in seconds
+    :param backoff: factor by which the interval grows while nothing changes
+    """
+    def __init__(self, browser, rfp_numbers=(), search=None, callback=None,
+                 queue=None, min_interval=60, max_interval=3600, backoff=2.0):
+        self.browser = browser
+        self.search = search
+        self.callback = callback
+        self.queue = queue
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.statuses = {}
+        self._schedule = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        for rfp_number in rfp_numbers:
+            self.watch(rfp_number)
+        if search:
+            self._schedule[None] = (0, min_interval)
+
+    def watch(self, rfp_number):
+        """
+        Start checking the given RFP individually.
+        """
+        with self._lock:
+            rfp_number = rfp.normalize_rfp_number(rfp_number)
+            self._schedule[rfp_number] = (0, self.min_interval)
+
+    def stop(self):
+        """
+        Make :meth:`run` return after the current check.
+        """
+        self._stop.set()
+
+    def run(self):
+        """
+        Check RFPs as they fall due until there is nothing left to watch or
+        :meth:`stop` is called.
+        """
+        while not self._stop.is_set():
+            wait = self.step()
+            if wait is None:
+                return
+            self._stop.wait(wait)
+
+    def step(self):
+        """
+        Run every check that is due. Return the number of seconds until the
+        next check, or None if nothing is left to watch.
+        """
+        now = time.time()
+        with self._lock:
+            due = [key for key, (at, interval) in self._schedule.items()
+                   if at <= now]
+        # the search query also refreshes the RFPs it covers
+        if None in due:
+            covered = self._check_search(due)
+            due = [key for key in due
+                   if key is not None and key not in covered]
+        for rfp_number in due:
+            self._check_one(rfp_number)
+        with self._lock:
+            if not self._schedule:
+                return None
+            return max(0, min(at for at, interval
+                              in self._schedule.values()) - time.time())
+
+    def _check_search(self, due):
+        """
+        Run the search filter and update every RFP in its results. Watched
+        RFPs among them are settled as if checked individually, but only
+        rescheduled if they are in `due`. Return the set of RFP numbers
+        found.
+        """
+        page = rfp.SearchPage(self.browser)
+        page.rfp_types(parked=True, posted=True, deleted=True)
+        for field, value in self.search.items():
+            getattr(page, field)(value)
+        try:
+            page = page.search()
+        except rfp.FailedTransitionError:
+            # SAPweb reports a search with no results as an error
+            self._reschedule(None, False)
+            return set()
+        if isinstance(page, rfp.ViewOnlyPage):
+            found = {rfp.normalize_rfp_number(page.rfp_number()):
+                     _status(page)}
+        else:
+            found = dict((rfp.normalize_rfp_number(row["rfp_number"]),
+                          _normalize_status(row["location_status"]))
+                         for row in page.result_table())
+        changed = False
+        for rfp_number, status in found.items():
+            rfp_changed = self._update(rfp_number, status)
+            changed = changed or rfp_changed
+            with self._lock:
+                watched = rfp_number in self._schedule
+            # a watched RFP is still checked individually once it leaves
+            # the results, so it stays scheduled unless it is done
+            done = TERMINAL.search(status or "")
+            if watched and (rfp_number in due or done):
+                self._settle(rfp_number, status, rfp_changed)
+        self._reschedule(None, changed)
+        return set(found)
+
+    def _check_one(self, rfp_number):
+        page = rfp.SearchPage(self.browser)
+        page.rfp_types(parked=True, posted=True, deleted=True)
+        page.rfp_number(rfp_number)
+        try:
+            page = page.search()
+        except rfp.FailedTransitionError:
+            # not found; keep checking in case it is only slow to appear
+            self._reschedule(rfp_number, False)
+            return
+        if isinstance(page, rfp.ViewOnlyPage):
+            status = _status(page)
+        else:
+            normalize = rfp.normalize_rfp_number
+            rows = [row for row in page.result_table()
+                    if normalize(row["rfp_number"]) == rfp_number]
+            if not rows:
+                # several results but not this one; try again later
+                self._reschedule(rfp_number, False)
+                return
+            status = _normalize_status(rows[0]["location_status"])
+        self._settle(rfp_number, status, self._update(rfp_number, status))
+
+    def _settle(self, rfp_number, status, changed):
+        """
+        Stop watching an RFP that reached a terminal state, or else schedule
+        its next check.
+        """
+        if TERMINAL.search(status or ""):
+            with self._lock:
+                self._schedule.pop(rfp_number, None)
+        else:
+            self._reschedule(rfp_number, changed)
+
+    def _update(self, rfp_number, status):
+        """
+        Record the status of an RFP, reporting it if it changed. Return True
+        if it changed.
+        """
+        old = self.statuses.get(rfp_number)
+        if old == status:
+            return False
+        self.statuses[rfp_number] = status
+        if self.callback is not None:
+            self.callback(rfp_number, old, status)
+        if self.queue is not None:
+            self.queue.put((rfp_number, old, status))
+        return True
+
+    def _reschedule(self, key, changed):
+        with self._lock:
+            if changed or key not in self._schedule:
+                interval = self.min_interval
+            else:
+                interval = min(self._schedule[key][1] * self.backoff,
+                               self.max_interval)
+            self._schedule[key] = (time.time() + interval, interval)
+
+def _status(page):
+    """
+    Describe the status of the RFP shown on a :class:`rfp.ViewOnlyPage`: the
+    inbox it is in, or else its latest history entry.
+    """
+    inbox = page.inbox()
+    if inbox:
+        return _normalize_status(inbox)
+    history = page.history()
+    return _normalize_status(history[-1][2]) if history else None
+
+def _normalize_status(status):
+    """
+    Reduce a status as SAPweb shows it, in the 'Location/Status' column of
+    search results, the 'Inbox' field or an RFP's history, to one form:
+    'posted' or 'deleted', the name of an inbox, or else the action without
+    its actor. Return None for an empty status.
+    """
+    status = " ".join((status or "").split())
+    if not status:
+        return None
+    terminal = TERMINAL.search(status)
+    if terminal:
+        return terminal.group(1).lower()
+    event = history.parse_event("", "", status)
+    return event.inbox or history._ACTOR.sub("", status)
@@ -0,0 +1,280 @@
+"""
+    watchdog
+    ~~~~~~~~
+
+    The `watchdog` module keeps long runs from stalling on a hung or bloated
+    Firefox. A watched browser has a deadline on every WebDriver command; if a
+    command runs past it, the call fails with :class:`HungBrowserError`
+    instead of waiting forever. The command is abandoned, and the browser is
+    shut down: a local geckodriver and Firefox are killed, and a session on a
+    remote WebDriver server is deleted there::
+
+        browser = watchdog.watch(sap_profiles.load_firefox(), timeout=120,
+                                 max_rss=2 << 30, max_operations=5000)
+
+    Browsers in a :class:`pool.BrowserPool` can be replaced automatically
+    once they hang, grow past `max_rss` bytes or serve `max_operations`
+    commands::
+
+        pool = BrowserPool(watchdog.supervise(sap_profiles.load_firefox,
+                                              timeout=120, max_rss=2 << 30),
+                           size=4, retire=watchdog.retire)
+
+    Process memory is read from /proc, so `max_rss` only has effect on Linux.
+"""
+
+import os
+import signal
+import sys
+import threading
+import time
+
+from pysapweb import sap_profiles
+
+class HungBrowserError(Exception):
+    """
+    Raised when a WebDriver command misses its deadline and the browser has
+    been killed, and by every later command on that browser.
+    """
+
+class Watchdog(object):
+    """
+    Supervises one WebDriver instance. See :func:`watch`.
+    """
+    def __init__(self, browser, timeout=120, timeouts=None, max_rss=None,
+                 max_operations=None, poll=1.0):
+        self.browser = browser
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self.max_rss = max_rss
+        self.max_operations = max_operations
+        self.poll = poll
+        self.operations = 0
+        self.hung = None
+        self._active = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._execute = browser.execute
+        self._quit = browser.quit
+        browser.execute = self.execute
+        browser.quit = self.quit
+        browser.watchdog = self
+        monitor = threading.Thread(target=self._monitor)
+        monitor.daemon = True
+        monitor.start()
+
+    def execute(self, command, params=None):
+        """
+        Run a WebDriver command with a deadline. Replaces the browser's own
+        `execute` method.
+        """
+        if self.hung:
+            raise HungBrowserError(self.hung)
+        deadline = time.time() + self.timeouts.get(command, self.timeout)
+        call = _Call(self._execute, command, params)
+        with self._lock:
+            self.operations += 1
+            self._active[call] = (command, deadline)
+        try:
+            if self.hung:
+                call.done.set()
+            call.done.wait()
+        finally:
+            with self._lock:
+                self._active.pop(call, None)
+        if not call.finished:
+            # abandoned by kill(); the command's thread may still be blocked
+            raise HungBrowserError(self.hung)
+        if call.error is not None:
+            if self.hung:
+                raise HungBrowserError(self.hung)
+            raise call.error[0], call.error[1], call.error[2]
+        return call.result
+
+    def quit(self):
+        """
+        Quit the browser and stop watching it. Replaces the browser's own
+        `quit` method. Selenium's quit always runs, so a copied profile is
+        removed even once the browser has hung; its commands then fail at
+        once rather than wait on the dead browser.
+        """
+        # Firefox may outlive geckodriver, so find it before quitting
+        pids = self._pids()
+        try:
+            self._quit()
+        except Exception:
+            if not self.hung:
+                raise
+        finally:
+            self._closed.set()
+            _kill(pids)
+
+    def rss(self):
+        """
+        Return the resident memory of geckodriver and every process it
+        started, in bytes, or None if it cannot be read.
+        """
+        if not os.path.isdir("/proc"):
+            return None
+        pids = self._pids()
+        if not pids:
+            return None
+        total = 0
+        for pid in pids:
+            try:
+                with open("/proc/%d/status" % pid) as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+            except (IOError, OSError, ValueError):
+                pass
+        return total
+
+    def needs_recycling(self):
+        """
+        Return True if the browser has hung, or has reached `max_rss` or
+        `max_operations`.
+        """
+        if self.hung:
+            return True
+        if self.max_operations and self.operations >= self.max_operations:
+            return True
+        if self.max_rss:
+            rss = self.rss()
+            return rss is not None and rss >= self.max_rss
+        return False
+
+    def kill(self, reason):
+        """
+        Kill geckodriver and Firefox, or for a remote browser, delete its
+        session on the server. If `reason` is given, the browser is marked
+        as hung, and pending and later commands raise
+        :class:`HungBrowserError` with that message at once.
+        """
+        if reason is not None:
+            self.hung = reason
+            with self._lock:
+                for call in self._active:
+                    call.done.set()
+        pids = self._pids()
+        if pids:
+            _kill(pids)
+        else:
+            sap_profiles.release_session(self.browser)
+
+    def _pids(self):
+        """
+        Return the PIDs of geckodriver and every process it started.
+        """
+        root = _root_pid(self.browser)
+        if root is None:
+            return []
+        if not os.path.isdir("/proc"):
+            return [root]
+        return _descendants(root) + [root]
+
+    def _monitor(self):
+        while not self._closed.wait(self.poll):
+            now = time.time()
+            with self._lock:
+                late = [command for command, deadline
+                        in self._active.values() if deadline <= now]
+            if late and not self.hung:
+                self.kill("WebDriver command %s did not finish within its "
+                          "deadline; the browser was killed." % late[0])
+
+class _Call(object):
+    """
+    A WebDriver command running in a thread of its own, so that the thread
+    that sent it can be released if it hangs.
+    """
+    def __init__(self, execute, command, params):
+        self.done = threading.Event()
+        self.finished = False
+        self.result = None
+        self.error = None
+        thread = threading.Thread(target=self._run,
+                                  args=(execute, command, params))
+        thread.daemon = True
+        thread.start()
+
+    def _run(self, execute, command, params):
+        try:
+            self.result = execute(command, params)
+        except Exception:
+            self.error = sys.exc_info()
+        self.finished = True
+        self.done.set()
+
+def watch(browser, timeout=120, timeouts=None, max_rss=None,
+          max_operations=None, poll=1.0):
+    """
+    Start supervising `browser` and return it.
+
+    :param timeout: seconds allowed for each WebDriver command
+    :param timeouts: dictionary of seconds allowed for specific commands, by
+        Selenium command name (e.g. 'get'), overriding `timeout`
+    :param max_rss: bytes of memory after which :func:`retire` is True
+    :param max_operations: commands after which :func:`retire` is True
+    :param poll: seconds between deadline checks
+    """
+    Watchdog(browser, timeout, timeouts, max_rss, max_operations, poll)
+    return browser
+
+def supervise(factory, **options):
+    """
+    Wrap a browser factory, such as :func:`sap_profiles.load_firefox`, so
+    that every browser it returns is watched with the given options (see
+    :func:`watch`).
+    """
+    return lambda: watch(factory(), **options)
+
+def retire(browser):
+    """
+    Return True if a watched browser should be replaced. Suitable as the
+    `retire` argument of :class:`pool.BrowserPool`.
+    """
+    watchdog = getattr(browser, "watchdog", None)
+    return watchdog is not None and watchdog.needs_recycling()
+
+def _root_pid(browser):
+    """
+    Return the PID of the geckodriver (or, without it, Firefox) process
+    behind `browser`, or None.
+    """
+    for owner in ("service", "binary"):
+        process = getattr(getattr(browser, owner, None), "process", None)
+        if process is not None and process.poll() is None:
+            return process.pid
+    return None
+
+def _kill(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+        except OSError:
+            pass
+
+def _descendants(root):
+    """
+    Return the PIDs of every process descended from `root`, read from /proc.
+    """
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open("/proc/%s/stat" % name) as f:
+                stat = f.read()
+        except (IOError, OSError):
+            continue
+        # the command name may contain spaces, so split after it
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(name))
+    found = []
+    pending = [root]
+    while pending:
+        for child in children.get(pending.pop(), ()):
+            found.append(child)
+            pending.append(child)
+    return found
@@ -8,6 +8,10 @@ setup(
     packages = ["pysapweb"],
     version = "0.9.1",
     install_requires = ["selenium"],
+    extras_require = {
+        "reporting": ["numpy"],
+        "static": ["lxml", "cssselect"],
+    },
 
     author = "btidor",
     author_email = "pysapweb@mit.edu",